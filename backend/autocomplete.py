@@ -0,0 +1,190 @@
+import heapq
+import re
+from bisect import bisect_left
+
+from catalog import iter_bits
+from text_index import tokenize
+
+""" Typeahead suggestions over course codes and titles
+
+    Course codes ("icsci31") and title words are kept in sorted arrays, so the
+    keys starting with a prefix are one bisect away. Instead of course ids the
+    arrays hold popularity ranks (0 = most popular), which makes the best n
+    matches simply the n smallest ranks in the range. Ranges too large to scan
+    on every keystroke have their top matches worked out when the index is built.
+"""
+
+MAX_SUGGESTIONS = 20 # most completions one lookup returns
+SCAN_LIMIT = 256 # prefix ranges with more keys than this are precomputed
+LAST_KEY = "\U0010ffff" # sorts after every key, prefix + LAST_KEY ends a prefix range
+
+# popularity weights
+W_PROGRAM = 3.0 # per major, minor or specialization listing the course
+W_DEPENDENT = 1.0 # per course that has it as a prerequisite
+W_TERM = 0.5 # per term it is offered in
+
+# what students type --> compact Courses.department
+DEPARTMENT_ALIASES = {
+    "ics": "icsci", "cs": "compsci", "inf": "in4matx", "informatics": "in4matx",
+    "stat": "stats", "bio": "biosci", "phys": "physics", "psy": "psych"
+}
+
+def compact(text) -> str:
+    # "I&C SCI 31" --> "icsci31"
+    return re.sub(r"[^a-z0-9]", "", (text or "").lower())
+
+class _PrefixArray():
+    """
+
+    Sorted keys with the popularity rank of the course behind each one
+
+    Member Variables:
+        -keys: sorted key strings, a course can appear under several keys
+        -ranks: ranks[i] is the course rank for keys[i]
+        -tops: prefix --> the MAX_SUGGESTIONS best distinct ranks, for ranges over SCAN_LIMIT keys
+
+    """
+    def __init__(self, pairs):
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.ranks = [rank for _, rank in pairs]
+        self.tops = {}
+        self._precompute()
+
+    def range(self, prefix) -> tuple:
+        return bisect_left(self.keys, prefix), bisect_left(self.keys, prefix + LAST_KEY)
+
+    def top(self, prefix, n) -> list:
+        # the n best distinct ranks under prefix, best first
+        if n <= MAX_SUGGESTIONS and prefix in self.tops:
+            return list(self.tops[prefix][:n])
+        lo, hi = self.range(prefix)
+        return heapq.nsmallest(n, set(self.ranks[lo:hi]))
+
+    def _precompute(self):
+        # walks the prefixes with more than SCAN_LIMIT keys, a child range only needs
+        # visiting when its parent was large too
+        keys = self.keys
+        stack = [("", 0, len(keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if hi - lo <= SCAN_LIMIT:
+                continue
+            self.tops[prefix] = tuple(heapq.nsmallest(MAX_SUGGESTIONS, set(self.ranks[lo:hi])))
+            depth = len(prefix)
+            i = lo
+            while i < hi:
+                if len(keys[i]) == depth:
+                    i += 1
+                    continue
+                child = prefix + keys[i][depth]
+                end = bisect_left(keys, child + LAST_KEY, i, hi)
+                stack.append((child, i, end))
+                i = end
+
+class CompletionIndex():
+    """
+
+    Prefix index for the search box, built from a Catalog
+
+    Member Variables:
+        -version: db_version of the catalog it was built from
+        -courses: rank --> (course_id, department, course_number, course_title), most popular first
+        -popularity: rank --> popularity score
+        -codes: _PrefixArray over compact course ids
+        -titles: _PrefixArray over title tokens
+        -departments: compact department names in the catalog
+
+    """
+    def __init__(self, catalog):
+        self.version = catalog.version
+        score = popularity(catalog)
+        rows = [row for row in catalog.courses if row is not None]
+        rows.sort(key=lambda row: (-score[catalog.index[row[0]]], row[0]))
+
+        self.courses = [row[:4] for row in rows]
+        self.popularity = [score[catalog.index[row[0]]] for row in rows]
+        self.codes = _PrefixArray([(compact(row[0]), rank) for rank, row in enumerate(rows)])
+        self.titles = _PrefixArray([(word, rank) for rank, row in enumerate(rows)
+                                    for word in dict.fromkeys(tokenize(row[3]))])
+        self.departments = {compact(row[1]) for row in rows}
+
+    def code_prefix(self, text) -> str:
+        """
+        code_prefix: query text --> prefix of a compact course id
+            "ics 31" --> "icsci31", "CS 161" --> "compsci161", "I&C SCI 3" --> "icsci3"
+        """
+        key = compact(text)
+        for size in range(len(key), 0, -1):
+            if key[:size] in self.departments:
+                return key
+        match = re.match(r"[a-z]+", key)
+        if match and match.group() in DEPARTMENT_ALIASES:
+            return DEPARTMENT_ALIASES[match.group()] + key[match.end():]
+        return key
+
+    def course_id(self, text):
+        """
+        course_id: the course whose code is exactly text, None when there is none
+            "ICS 31" --> "I&CSCI31", "compsci 161" --> "COMPSCI161"
+        """
+        key = self.code_prefix(text)
+        lo, hi = self.codes.range(key)
+        if not key or lo == hi or self.codes.keys[lo] != key:
+            return None
+        return self.courses[self.codes.ranks[lo]][0]
+
+    def complete(self, text, n=10) -> list:
+        """
+        complete: up to n suggestions for partially typed text, course code matches
+            (an exact code first) before title matches, each group most popular first
+            returns [{"id", "dept", "code", "title"}]
+        """
+        n = min(max(n, 0), MAX_SUGGESTIONS)
+        key = self.code_prefix(text)
+        if not n or not key:
+            return []
+
+        ranks = self.codes.top(key, n)
+        lo, hi = self.codes.range(key)
+        if lo < hi and self.codes.keys[lo] == key:
+            exact = self.codes.ranks[lo]
+            ranks = [exact] + [rank for rank in ranks if rank != exact][:n - 1]
+        if len(ranks) < n:
+            seen = set(ranks)
+            ranks += [rank for rank in self._title_ranks(text, n) if rank not in seen][:n - len(ranks)]
+        return [self._suggestion(rank) for rank in ranks]
+
+    def _title_ranks(self, text, n) -> list:
+        # every query token must start some title word of the course, the last one may be half typed
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        if len(tokens) == 1:
+            return self.titles.top(tokens[0], n)
+        ranges = [self.titles.range(token) for token in tokens]
+        ranks = [set(self.titles.ranks[lo:hi]) for lo, hi in ranges]
+        ranks.sort(key=len)
+        return heapq.nsmallest(n, ranks[0].intersection(*ranks[1:]))
+
+    def _suggestion(self, rank) -> dict:
+        cid, dept, num, title = self.courses[rank]
+        return {"id": cid, "dept": dept, "code": f"{dept} {num}", "title": title}
+
+def popularity(catalog) -> list:
+    """
+    popularity: dense id --> how often the course shows up in the catalog,
+        counting program lists, courses it is a prerequisite of, and terms it is offered in
+    """
+    score = [0.0] * len(catalog.ids)
+    for table in (catalog.majors, catalog.minors, catalog.specializations):
+        for bits in table.values():
+            for i in iter_bits(bits):
+                score[i] += W_PROGRAM
+    for i in catalog.prereq_targets:
+        score[i] += W_DEPENDENT
+    for (year, quarter, time_of_day, course_format), bits in catalog.terms.items():
+        if year and quarter and time_of_day is None and course_format is None:
+            for i in iter_bits(bits):
+                score[i] += W_TERM
+    return score
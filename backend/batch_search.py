@@ -0,0 +1,93 @@
+from catalog import iter_bits, to_bits
+
+""" Many searches against one Catalog at once, for advising reports
+
+    Instead of one course bitset per profile, the work is done per course with a
+    bitset over profiles (bit p = profile p): which profiles completed it, want it,
+    have it offered in their term, and have every prerequisite done. A course is
+    visited once per chunk of profiles no matter how many profiles there are.
+"""
+
+CHUNK_SIZE = 1024 # profiles evaluated together, results stream out one chunk at a time
+
+def search_batch(catalog, queries, chunk_size=CHUNK_SIZE):
+    """
+    search_batch: Catalog.search for every CourseQuery in queries
+        yields (position, set of course ids) in input order, queries may be any iterable
+    """
+    chunk = []
+    start = 0
+    for query in queries:
+        chunk.append(query)
+        if len(chunk) == chunk_size:
+            yield from _search_chunk(catalog, chunk, start)
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield from _search_chunk(catalog, chunk, start)
+
+def _search_chunk(catalog, queries, start):
+    completed = {} # dense course id --> profiles that completed it
+    wanted = {} # dense course id --> profiles whose majors/minors/specializations include it
+    terms = {} # term_bits key --> profiles searching that term
+    majors = {} # major id --> profiles
+    minors = {} # minor id --> profiles
+    specializations = {} # specialization id --> profiles
+    any_course = 0 # profiles without a major, every offered course is a candidate for them
+
+    for p, query in enumerate(queries):
+        bit = 1 << p
+        for cid in query.completed:
+            dense = catalog.index.get(cid)
+            if dense is not None:
+                completed[dense] = completed.get(dense, 0) | bit
+        if query.majors:
+            for major_id in query.majors:
+                majors[major_id] = majors.get(major_id, 0) | bit
+            for minor_id in query.minors:
+                minors[minor_id] = minors.get(minor_id, 0) | bit
+            for spec_id in query.specializations:
+                specializations[spec_id] = specializations.get(spec_id, 0) | bit
+        else:
+            any_course |= bit
+        key = (query.year, query.quarter, query.time_of_day, query.course_format)
+        terms[key] = terms.get(key, 0) | bit
+
+    for table, profiles_by_program in ((catalog.majors, majors), (catalog.minors, minors),
+                                       (catalog.specializations, specializations)):
+        for program_id, profiles in profiles_by_program.items():
+            for i in iter_bits(table.get(program_id, 0)):
+                wanted[i] = wanted.get(i, 0) | profiles
+
+    # only courses some profile could get are visited, all offered ones only if a profile has no major
+    candidates = to_bits(wanted)
+    if any_course:
+        for key in terms:
+            candidates |= catalog.term_bits(*key)
+
+    offered = {} # dense course id --> profiles whose term offers it
+    for key, profiles in terms.items():
+        for i in iter_bits(catalog.term_bits(*key) & candidates):
+            offered[i] = offered.get(i, 0) | profiles
+
+    # profile x course result, stored as one profile bitset per course
+    offsets, targets = catalog.prereq_offsets, catalog.prereq_targets
+    results = {}
+    for i, profiles in offered.items():
+        profiles &= (wanted.get(i, 0) & ~completed.get(i, 0)) | any_course
+        for j in range(offsets[i], offsets[i + 1]):
+            if not profiles:
+                break
+            profiles &= completed.get(targets[j], 0)
+        if profiles:
+            results[i] = profiles
+
+    # transpose back to one course set per profile
+    per_profile = [set() for _ in queries]
+    ids = catalog.ids
+    for i, profiles in results.items():
+        cid = ids[i]
+        for p in iter_bits(profiles):
+            per_profile[p].add(cid)
+    for p, courses in enumerate(per_profile):
+        yield start + p, courses
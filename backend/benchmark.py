@@ -0,0 +1,278 @@
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import data_categorization
+import sql_index
+from autocomplete import CompletionIndex
+from catalog import load_catalog
+from connection import close_all
+from prereq_graph import PrereqGraph
+from sql_index import CourseQuery, SearchEngine
+
+""" Benchmarks for indexing and search on a synthetic catalog
+
+    Run: python benchmark.py [--courses 10000] [--majors 200] [--minors 100] [--terms 12]
+                             [--prereqs 3] [--queries 500] [--seed 0] [--no-memory]
+                             [--db path] [--output results.json]
+
+    Prints one JSON document, so runs can be stored and compared between releases.
+"""
+
+DEPARTMENTS = ["COMPSCI", "I&CSCI", "IN4MATX", "MATH", "STATS", "PHYSICS", "CHEM", "BIOSCI",
+               "ECON", "PSYCH", "SOCIOL", "ANTHRO", "HISTORY", "PHILOS", "WRITING", "ART"]
+QUARTERS = ["winter", "spring", "fall"]
+SECTION_TYPES = ["Lec", "Dis", "Lab"]
+DAY_PATTERNS = ["MWF", "TuTh", "MW", "M", "W", "F"]
+WORDS = ["introduction", "advanced", "topics", "systems", "theory", "design", "analysis", "data",
+         "methods", "research", "seminar", "applied", "computation", "history", "culture", "lab"]
+
+def generate_catalog(courses=10000, terms=12, prereqs=3.0, seed=0):
+    """
+    generate_catalog: synthetic course records in the all_course_data.json format
+        courses: number of courses
+        terms: number of (year, quarter) terms, walking back from fall 2026
+        prereqs: average prerequisites per course, always pointing at earlier courses so the graph is a DAG
+    """
+    rng = random.Random(seed)
+    term_names = []
+    year, index = 2026, len(QUARTERS) - 1
+    for _ in range(terms):
+        term_names.append(f"{year} {QUARTERS[index].title()}")
+        index -= 1
+        if index < 0:
+            year, index = year - 1, len(QUARTERS) - 1
+    ge_names = list(sql_index.GE_CATEGORIES)
+
+    ids = []
+    for n in range(courses):
+        dept = DEPARTMENTS[n % len(DEPARTMENTS)]
+        number = f"{n // len(DEPARTMENTS)}{rng.choice(['', 'A', 'B', 'C'])}"
+        cid = f"{dept}{number}"
+        ids.append(cid)
+        prereq_count = min(len(ids) - 1, int(rng.expovariate(1 / prereqs))) if prereqs else 0
+        offered = rng.sample(term_names, rng.randint(1, min(3, len(term_names))))
+
+        course_terms = []
+        code = n * 10
+        for term in offered:
+            sections = []
+            for section_type in SECTION_TYPES[:rng.randint(1, len(SECTION_TYPES))]:
+                for _ in range(rng.randint(1, 3)):
+                    code += 1
+                    start = rng.randrange(8 * 60, 20 * 60, 30)
+                    building = rng.choice(["DBH", "ICS", "SSL", "ON"])
+                    sections.append({
+                        "sectionCode": code,
+                        "sectionType": section_type,
+                        "days": rng.choice(DAY_PATTERNS),
+                        "startTime": {"hour": start // 60, "minute": start % 60},
+                        "endTime": {"hour": (start + 50) // 60, "minute": (start + 50) % 60},
+                        "building": building,
+                        "room": str(rng.randint(100, 300))
+                    })
+            course_terms.append({"term": term, "sections": sections})
+
+        yield {
+            "id": cid,
+            "department": dept,
+            "courseNumber": number,
+            "title": " ".join(rng.sample(WORDS, 3)).title(),
+            "description": " ".join(rng.choices(WORDS, k=20)),
+            "minUnits": 4,
+            "maxUnits": 4,
+            "geList": rng.sample(ge_names, rng.choice([0, 0, 0, 1, 2])),
+            "prerequisites": [{"id": pid} for pid in rng.sample(ids[:-1], prereq_count)],
+            "courseLevel": "Upper Division (100-199)" if n % 3 else "Lower Division (1-99)",
+            "instructors": [{"name": f"Prof {rng.randrange(courses // 4 + 1)}"}],
+            "terms": course_terms
+        }
+
+def add_programs(db_path, course_ids, majors=200, minors=100, size=40, seed=0):
+    """
+    add_programs: random Majors/Minors and their course lists (nothing in the loaders fills these yet)
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.executemany("INSERT OR REPLACE INTO Majors(major_id, major_name) VALUES (?, ?)",
+                     [(f"BS-{m}", f"Major {m}") for m in range(majors)])
+    conn.executemany("INSERT OR REPLACE INTO MajorCourses(major_id, course_id) VALUES (?, ?)",
+                     [(f"BS-{m}", cid) for m in range(majors) for cid in rng.sample(course_ids, size)])
+    conn.executemany("INSERT OR REPLACE INTO Minors(minor_id, minor_name) VALUES (?, ?)",
+                     [(f"MN-{m}", f"Minor {m}") for m in range(minors)])
+    conn.executemany("INSERT OR REPLACE INTO MinorCourses(minor_id, course_id) VALUES (?, ?)",
+                     [(f"MN-{m}", cid) for m in range(minors) for cid in rng.sample(course_ids, size // 2)])
+    sql_index.bump_db_version(conn)
+    conn.commit()
+    conn.close()
+
+def latency_stats(samples) -> dict:
+    # samples in seconds --> milliseconds summary
+    samples = sorted(samples)
+    count = len(samples)
+    total = sum(samples)
+    return {
+        "count": count,
+        "qps": round(count / total, 1) if total else None,
+        "mean_ms": round(1000 * total / count, 4),
+        "p50_ms": round(1000 * samples[count // 2], 4),
+        "p99_ms": round(1000 * samples[min(count - 1, int(count * 0.99))], 4),
+        "max_ms": round(1000 * samples[-1], 4)
+    }
+
+def measure(fn, *args, trace=True):
+    """
+    measure: runs fn, returns (result, seconds, peak traced MB or None)
+        tracemalloc slows Python code several times over, so the peak comes from
+        a second, traced run and the timing from an untraced one
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    if not trace:
+        return result, elapsed, None
+
+    del result
+    gc.collect()
+    tracemalloc.start()
+    result = fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, round(peak / 2**20, 2)
+
+def time_queries(fn, queries) -> dict:
+    samples = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        samples.append(time.perf_counter() - start)
+    return latency_stats(samples)
+
+def random_queries(rng, count, majors, minors, course_ids, terms) -> list:
+    queries = []
+    for _ in range(count):
+        year, quarter = rng.choice(terms)
+        queries.append(CourseQuery(
+            majors=[f"BS-{m}" for m in rng.sample(range(majors), rng.choice([1, 1, 2]))],
+            minors=[f"MN-{m}" for m in rng.sample(range(minors), rng.choice([0, 1]))] if minors else [],
+            completed=rng.sample(course_ids, min(len(course_ids), rng.randint(0, 40))),
+            year=year, quarter=quarter
+        ))
+    return queries
+
+def run(courses=10000, majors=200, minors=100, terms=12, prereqs=3.0, queries=500, seed=0,
+        db_path=None, trace=True) -> dict:
+    """
+    run: builds a synthetic courses.db and times every indexing and search stage
+        trace: also record each build stage's peak memory (runs those stages twice)
+        returns the results as a json-ready dict
+    """
+    rng = random.Random(seed)
+    workdir = None
+    if db_path is None:
+        workdir = tempfile.mkdtemp(prefix="searchengine-bench-")
+        db_path = os.path.join(workdir, "courses.db")
+
+    records = list(generate_catalog(courses, terms, prereqs, seed))
+    course_ids = [course["id"] for course in records]
+    results = {
+        "config": {"courses": courses, "majors": majors, "minors": minors, "terms": terms,
+                   "prereqs": prereqs, "queries": queries, "seed": seed},
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "stages": {}
+    }
+    stages = results["stages"]
+
+    # indexing, create_index's progress lines go to stderr so stdout stays json
+    with contextlib.redirect_stdout(sys.stderr):
+        conn, elapsed, peak = measure(sql_index.create_index, db_path, records, trace=trace)
+    conn.close()
+    stages["create_index"] = {"seconds": round(elapsed, 3), "courses_per_sec": round(courses / elapsed, 1),
+                              "peak_mb": peak}
+    add_programs(db_path, course_ids, majors, minors, seed=seed)
+
+    indexes, elapsed, peak = measure(data_categorization.build_indexes, records, trace=trace)
+    stages["build_indexes"] = {"seconds": round(elapsed, 3), "courses_per_sec": round(courses / elapsed, 1),
+                               "peak_mb": peak}
+    _, elapsed, peak = measure(data_categorization.save_indexes, db_path, indexes, trace=trace)
+    stages["save_indexes"] = {"seconds": round(elapsed, 3), "peak_mb": peak}
+    del records, indexes
+
+    # in-memory structures
+    catalog, elapsed, peak = measure(load_catalog, db_path, trace=trace)
+    stages["load_catalog"] = {"seconds": round(elapsed, 3), "peak_mb": peak}
+    _, elapsed, peak = measure(PrereqGraph, catalog, trace=trace)
+    stages["prereq_graph"] = {"seconds": round(elapsed, 3), "peak_mb": peak}
+
+    # queries, uncached so every call does the full search
+    term_list = sorted({(y, q) for y, q, t, f in catalog.terms if y and q and t is None and f is None})
+    query_list = random_queries(rng, queries, majors, minors, course_ids, term_list)
+    sql_engine = SearchEngine(db_path, cache=None, use_catalog=False)
+    engine = SearchEngine(db_path, cache=None)
+    engine.catalog()
+    stages["search_sql"] = time_queries(sql_engine.search, query_list)
+    stages["search_catalog"] = time_queries(engine.search, query_list)
+    stages["search_ranked_sql"] = time_queries(lambda q: sql_engine.search_ranked(q, 10), query_list)
+    stages["search_ranked_catalog"] = time_queries(lambda q: engine.search_ranked(q, 10), query_list)
+    words = [" ".join(rng.sample(WORDS, 2)) for _ in query_list]
+    stages["search_text"] = time_queries(lambda text: engine.search_text(text, 10), words)
+    # one letter dropped from each word, so every query takes the fuzzy path
+    typos = [" ".join(word[:i] + word[i + 1:] for word in text.split() for i in [rng.randrange(len(word))])
+             for text in words]
+    stages["search_fuzzy"] = time_queries(lambda text: engine.search_text(text, 10), typos)
+    _, elapsed, peak = measure(CompletionIndex, catalog, trace=trace)
+    stages["completion_index"] = {"seconds": round(elapsed, 3), "peak_mb": peak}
+    prefixes = [text[:rng.randint(1, len(text))] for text in words + rng.sample(course_ids, len(words))]
+    engine.completion_index()
+    stages["complete"] = time_queries(lambda text: engine.complete(text, 8), prefixes)
+
+    cached = SearchEngine(db_path)
+    for query in query_list:
+        cached.search(query)
+    stages["search_cached"] = time_queries(cached.search, query_list)
+
+    close_all(db_path)
+    if workdir:
+        os.remove(db_path)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        os.rmdir(workdir)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark indexing and search on a synthetic catalog")
+    parser.add_argument("--courses", type=int, default=10000)
+    parser.add_argument("--majors", type=int, default=200)
+    parser.add_argument("--minors", type=int, default=100)
+    parser.add_argument("--terms", type=int, default=12)
+    parser.add_argument("--prereqs", type=float, default=3.0, help="average prerequisites per course")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--db", default=None, help="keep the generated database at this path")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced peak memory runs")
+    parser.add_argument("--output", default=None, help="write the json here instead of stdout")
+    args = parser.parse_args(argv)
+
+    results = run(args.courses, args.majors, args.minors, args.terms, args.prereqs,
+                  args.queries, args.seed, args.db, not args.no_memory)
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,255 @@
+import re
+from array import array
+
+import metrics
+from connection import get_connection
+from query_cache import db_version
+from sections import TIME_RANGES
+
+""" In-memory snapshot of courses.db for SQL-free searches
+
+    Every course id gets a dense integer id, and each membership (major, minor,
+    specialization, GE, department, level, term) is a Python int used as a bitset,
+    bit i set --> course ids[i] is a member. Prerequisites are kept as CSR arrays.
+"""
+
+def course_level(course_number):
+    # "122A" --> "upper", "H2" --> "" (no leading number)
+    match = re.match(r"\d+", course_number or "")
+    if not match:
+        return ""
+    number = int(match.group())
+    if number < 100:
+        return "lower"
+    return "upper" if number < 200 else "graduate"
+
+def iter_bits(bits):
+    # positions of the set bits, lowest first
+    digits = bin(bits)[:1:-1]
+    position = digits.find("1")
+    while position != -1:
+        yield position
+        position = digits.find("1", position + 1)
+
+def to_bits(positions) -> int:
+    # one int built from a byte buffer instead of OR-ing in a bit at a time
+    positions = list(positions)
+    if not positions:
+        return 0
+    buffer = bytearray(max(positions) // 8 + 1)
+    for position in positions:
+        buffer[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(buffer, "little")
+
+class Catalog():
+    """
+
+    Compiled, read-only course catalog
+
+    Member Variables:
+        -version: db_version the snapshot was loaded from
+        -ids: dense id --> course_id
+        -index: course_id --> dense id
+        -courses: dense id --> (course_id, department, course_number, course_title, min_units, max_units),
+                  None for ids only seen in Terms/Prerequisites/program tables
+        -majors, minors, specializations: program id --> bitset of its courses
+        -ge: ge_id --> bitset
+        -departments: department --> bitset
+        -levels: "lower" / "upper" / "graduate" --> bitset
+        -terms: (year, quarter, time_of_day, format) --> bitset of courses with a matching meeting,
+                None in any position matches everything
+        -prereq_offsets, prereq_targets: CSR prerequisites, course i needs
+                prereq_targets[prereq_offsets[i]:prereq_offsets[i + 1]]
+        -has_prereqs: bitset of courses with at least one prerequisite
+
+    A Catalog is never modified after load_catalog returns, so it can be shared
+    between threads without locking.
+
+    """
+    def __init__(self, version=0):
+        self.version = version
+        self.ids = []
+        self.index = {}
+        self.courses = []
+        self.majors = {}
+        self.minors = {}
+        self.specializations = {}
+        self.ge = {}
+        self.departments = {}
+        self.levels = {}
+        self.terms = {}
+        self.prereq_offsets = array("I", [0])
+        self.prereq_targets = array("I")
+        self.has_prereqs = 0
+
+    def _id(self, course_id):
+        # dense id for course_id, assigned on first sight while loading
+        dense = self.index.get(course_id)
+        if dense is None:
+            dense = self.index[course_id] = len(self.ids)
+            self.ids.append(course_id)
+            self.courses.append(None)
+        return dense
+
+    def bits(self, course_ids) -> int:
+        # ids missing from the catalog are skipped
+        index = self.index
+        return to_bits(index[cid] for cid in course_ids if cid in index)
+
+    def course_ids(self, bits) -> list:
+        return [self.ids[i] for i in iter_bits(bits)]
+
+    def union(self, table, keys) -> int:
+        bits = 0
+        for key in keys:
+            bits |= table.get(key, 0)
+        return bits
+
+    def term_bits(self, year=None, quarter=None, time_of_day=None, course_format=None) -> int:
+        if year:
+            year = int(year)
+        return self.terms.get((year or None, quarter.lower() if quarter else None,
+                               time_of_day or None, course_format or None), 0)
+
+    def prerequisites_met(self, bits, completed) -> int:
+        """
+        prerequisites_met: the courses in bits whose prerequisites are all in completed
+        """
+        done = {self.index[cid] for cid in completed if cid in self.index}
+        offsets, targets = self.prereq_offsets, self.prereq_targets
+        blocked = []
+        for i in iter_bits(bits & self.has_prereqs):
+            for j in range(offsets[i], offsets[i + 1]):
+                if targets[j] not in done:
+                    blocked.append(i)
+                    break
+        return bits & ~to_bits(blocked)
+
+    def search(self, majors, minors, completed, year, quarter,
+               time_of_day=None, course_format=None, specializations=()) -> set:
+        """
+        search: same results as sql_index.search_feasible without touching the database
+        """
+        with metrics.stage("candidates"):
+            bits = self.term_bits(year, quarter, time_of_day, course_format)
+            # without a major every course offered in the term is a candidate
+            if majors:
+                wanted = (self.union(self.majors, majors) | self.union(self.minors, minors)
+                          | self.union(self.specializations, specializations))
+                bits &= wanted & ~self.bits(completed)
+        with metrics.stage("prerequisites"):
+            bits = self.prerequisites_met(bits, completed)
+        return set(self.course_ids(bits))
+
+    def memberships(self, course_ids, majors, minors) -> list:
+        """
+        memberships: (course_id, in_major, in_minor, has_prereqs) for each course,
+            the flags sql_index.score_courses ranks by
+        """
+        major_bits = self.union(self.majors, majors)
+        minor_bits = self.union(self.minors, minors)
+        rows = []
+        for cid in course_ids:
+            dense = self.index.get(cid)
+            mask = 1 << dense if dense is not None else 0
+            rows.append((cid, bool(major_bits & mask), bool(minor_bits & mask),
+                         bool(self.has_prereqs & mask)))
+        return rows
+
+    def metas(self, course_ids) -> dict:
+        """
+        metas: same results as sql_index.get_course_metas
+        """
+        metas = {}
+        for cid in course_ids:
+            dense = self.index.get(cid)
+            row = self.courses[dense] if dense is not None else None
+            if row is None:
+                metas[cid] = {"dept": "", "code": cid, "title": cid, "min_units": None, "max_units": None}
+            else:
+                _, dept, num, title, min_u, max_u = row
+                metas[cid] = {"dept": dept, "code": f"{dept} {num}", "title": title,
+                              "min_units": min_u, "max_units": max_u}
+        return metas
+
+    def rows(self, bits, dept=None, ge_id=None, level=None, max_units=None) -> list:
+        """
+        rows: Courses rows for the courses in bits, narrowed by the optional filters
+            max_units keeps courses whose min_units fit under it
+        """
+        if dept:
+            bits &= self.departments.get(dept, 0)
+        if ge_id:
+            bits &= self.ge.get(ge_id, 0)
+        if level:
+            bits &= self.levels.get(level, 0)
+        rows = []
+        for i in iter_bits(bits):
+            row = self.courses[i]
+            if row is not None and (max_units is None or row[4] <= max_units):
+                rows.append(row)
+        return rows
+
+def _add(table, key, dense):
+    # positions are collected while loading and turned into bitsets by _freeze
+    table.setdefault(key, []).append(dense)
+
+def _freeze(table):
+    for key, positions in table.items():
+        table[key] = to_bits(positions)
+
+def load_catalog(db_path) -> Catalog:
+    """
+    load_catalog: reads every table search needs into a Catalog
+    """
+    conn = get_connection(db_path)
+    catalog = Catalog(db_version(db_path))
+
+    for row in conn.execute("""
+        SELECT course_id, department, course_number, course_title, min_units, max_units
+        FROM Courses ORDER BY course_id
+    """):
+        dense = catalog._id(row[0])
+        catalog.courses[dense] = row
+        _add(catalog.departments, row[1], dense)
+        level = course_level(row[2])
+        if level:
+            _add(catalog.levels, level, dense)
+
+    for table, id_column, target in (("MajorCourses", "major_id", catalog.majors),
+                                     ("MinorCourses", "minor_id", catalog.minors),
+                                     ("SpecializationCourses", "specialization_id", catalog.specializations)):
+        for program_id, cid in conn.execute(f"SELECT {id_column}, course_id FROM {table}"):
+            _add(target, program_id, catalog._id(cid))
+
+    for cid, ge_id in conn.execute("SELECT course_id, ge_id FROM GenEdRequirements"):
+        _add(catalog.ge, ge_id, catalog._id(cid))
+
+    # every meeting row is filed under all 16 wildcard combinations of its filters
+    ranges = list(TIME_RANGES.items())
+    for cid, year, quarter, start, fmt in conn.execute(
+            "SELECT course_id, year, quarter, start_time, format FROM Terms"):
+        dense = catalog._id(cid)
+        times = [None]
+        if start is not None:
+            times += [name for name, (lo, hi) in ranges if lo <= start < hi]
+        formats = [None, fmt] if fmt else [None]
+        for y in (None, year):
+            for q in (None, quarter):
+                for t in times:
+                    for f in formats:
+                        _add(catalog.terms, (y, q, t, f), dense)
+
+    for table in (catalog.majors, catalog.minors, catalog.specializations, catalog.ge,
+                  catalog.departments, catalog.levels, catalog.terms):
+        _freeze(table)
+
+    prereqs = {}
+    for cid, prereq_id in conn.execute("SELECT course_id, prereq_id FROM Prerequisites"):
+        prereqs.setdefault(catalog._id(cid), []).append(catalog._id(prereq_id))
+    for dense in range(len(catalog.ids)):
+        catalog.prereq_targets.extend(prereqs.get(dense, ()))
+        catalog.prereq_offsets.append(len(catalog.prereq_targets))
+    catalog.has_prereqs = to_bits(prereqs)
+
+    return catalog
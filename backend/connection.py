@@ -0,0 +1,141 @@
+import atexit
+import os
+import sqlite3
+import threading
+
+import metrics
+
+""" Shared SQLite connections for sql_index and CourseSearch """
+
+CACHED_STATEMENTS = 256 # prepared statements kept per connection
+
+class ConnectionManager():
+    """
+
+    Hands out read connections to one database file
+
+    Member Variables:
+        -db_path: path to database
+        -_local: thread local storage holding each thread's connection
+        -_connections: every connection opened so far (used by close)
+        -generation: bumped by invalidate, connections from an older generation are replaced on next use
+
+    Each thread gets its own connection the first time it asks for one and
+    keeps reusing it, so a search costs cursor operations instead of opens.
+    Connections run in WAL mode so readers never block on create_index, and
+    keep a statement cache so repeated helper queries skip re-preparing.
+
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self.generation = 0
+
+    def connection(self) -> sqlite3.Connection:
+        local = self._local
+        conn = getattr(local, "conn", None)
+        if conn is not None and local.generation != self.generation:
+            # the file was reloaded, drop this thread's connection but leave it open
+            # for any cursor the thread is still reading from
+            with self._lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn = None
+        if conn is None:
+            conn = self._open()
+            local.conn = conn
+            local.generation = self.generation
+            local.traced = False
+            local.timed = None
+            with self._lock:
+                self._connections.append(conn)
+        if local.traced is not metrics.ENABLED:
+            # instrumentation was switched on/off since this connection was last used
+            metrics.trace(conn, metrics.ENABLED)
+            local.traced = metrics.ENABLED
+            local.timed = metrics.TimedConnection(conn) if metrics.ENABLED else None
+        return local.timed or conn
+
+    def execute(self, query: str, params=()):
+        return self.connection().execute(query, params)
+
+    def _open(self):
+        # check_same_thread is off so close() can reach every thread's connection,
+        # each connection is still only used by the thread that opened it
+        metrics.connection_opened()
+        with metrics.stage("connect"):
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=CACHED_STATEMENTS)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError:
+            # read-only location --> keep the default rollback journal
+            pass
+        conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    def invalidate(self):
+        # other threads may be mid query, so nothing is closed here, each thread
+        # swaps its connection the next time it asks for one
+        with self._lock:
+            self.generation += 1
+
+    def close(self):
+        with self._lock:
+            connections = self._connections
+            self._connections = []
+            # threads holding a closed connection open a new one on next use
+            self._local = threading.local()
+        for conn in connections:
+            conn.close()
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+def _key(db_path):
+    if db_path == ":memory:":
+        return db_path
+    return os.path.abspath(db_path)
+
+def get_manager(db_path) -> ConnectionManager:
+    key = _key(db_path)
+    manager = _managers.get(key)
+    if manager is None:
+        with _managers_lock:
+            manager = _managers.get(key)
+            if manager is None:
+                manager = ConnectionManager(db_path)
+                _managers[key] = manager
+    return manager
+
+def get_connection(db_path) -> sqlite3.Connection:
+    return get_manager(db_path).connection()
+
+def close_all(db_path=None):
+    """
+    close_all: closes pooled connections
+        db_path: only close connections to this database, None closes everything
+    """
+    with _managers_lock:
+        if db_path is None:
+            managers = list(_managers.values())
+            _managers.clear()
+        else:
+            manager = _managers.pop(_key(db_path), None)
+            managers = [manager] if manager else []
+    for manager in managers:
+        manager.close()
+
+def invalidate(db_path):
+    """
+    invalidate: makes every thread open a fresh connection to db_path on its next query,
+        without closing connections other threads may still be using
+    """
+    manager = _managers.get(_key(db_path))
+    if manager is not None:
+        manager.invalidate()
+
+atexit.register(close_all)
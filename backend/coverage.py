@@ -0,0 +1,173 @@
+from catalog import iter_bits
+
+""" Smallest sets of courses covering outstanding GE categories and specializations
+
+    Every feasible course gets a bitmask over the outstanding requirements (bit r
+    set --> the course counts toward requirement r). Courses with the same mask are
+    interchangeable and a mask inside another one never helps a cover, so the
+    search only sees the few distinct, undominated masks. Those are covered
+    exactly with a breadth first search over the covered-requirement states
+    (at most 2^requirements of them), falling back to greedy set cover when
+    there are too many requirements for that.
+"""
+
+PLANS = 3 # alternative plans returned
+MAX_COURSES = 4 # most courses in one plan
+ALTERNATIVES = 5 # courses listed as swaps for each pick
+EXACT_LIMIT = 14 # requirements covered exactly, more fall back to greedy
+MAX_STATES = 50000 # states the exact search may visit before falling back to greedy
+
+def feasible_bits(catalog, completed, year=None, quarter=None, time_of_day=None, course_format=None) -> int:
+    """
+    feasible_bits: courses offered in the term, not completed and with every prerequisite done
+    """
+    bits = catalog.term_bits(year, quarter, time_of_day, course_format) & ~catalog.bits(completed)
+    return catalog.prerequisites_met(bits, completed)
+
+def course_masks(requirements, feasible) -> dict:
+    """
+    course_masks: dense id --> bitmask of the requirements the course counts toward
+        requirements: list of (name, bitset of satisfying courses)
+    """
+    masks = {}
+    for r, (_, bits) in enumerate(requirements):
+        for i in iter_bits(bits & feasible):
+            masks[i] = masks.get(i, 0) | (1 << r)
+    return masks
+
+def undominated(masks) -> list:
+    # distinct masks that are not a subset of another, widest first
+    kept = []
+    for mask in sorted(set(masks), key=lambda m: (-bin(m).count("1"), m)):
+        if not any(mask & ~other == 0 for other in kept):
+            kept.append(mask)
+    return kept
+
+def greedy_cover(masks, target, max_courses=MAX_COURSES) -> list:
+    """
+    greedy_cover: repeatedly takes the mask adding the most uncovered requirements
+    """
+    chosen = []
+    covered = 0
+    while covered != target and len(chosen) < max_courses:
+        best = max(masks, key=lambda m: bin(m & ~covered).count("1"), default=0)
+        if not best & ~covered:
+            break
+        chosen.append(best)
+        covered |= best
+    return chosen
+
+def exact_covers(masks, target, max_courses=MAX_COURSES, limit=PLANS, max_states=MAX_STATES):
+    """
+    exact_covers: up to limit sets of masks covering as much of target as max_courses masks can,
+        each as small as possible, or None when the search outgrows max_states
+
+    Breadth first over covered states: layer d holds every state reachable with d
+    masks, together with every (previous state, mask) that first reached it, so
+    the covers can be read back along any of those parents.
+    """
+    parents = {0: []}
+    layer = [0]
+    best = 0
+    for _ in range(max_courses):
+        if best == target:
+            break
+        next_layer = {}
+        for state in layer:
+            for mask in masks:
+                new = state | mask
+                if new == state or (new in parents and new not in next_layer):
+                    continue
+                next_layer.setdefault(new, []).append((state, mask))
+        if not next_layer:
+            break
+        parents.update(next_layer)
+        if len(parents) > max_states:
+            return None
+        layer = list(next_layer)
+        # a state from an earlier layer covering as much needs fewer courses, keep it
+        widest = max(layer, key=lambda s: (bin(s).count("1"), -s))
+        if bin(widest).count("1") > bin(best).count("1"):
+            best = widest
+
+    covers = []
+    seen = set()
+    steps = 0
+
+    def walk(state, chosen):
+        # the same cover comes back once per order its masks can be taken in, steps bounds that
+        nonlocal steps
+        steps += 1
+        if len(covers) == limit or steps > max_states:
+            return
+        if state == 0:
+            cover = tuple(sorted(chosen))
+            if cover not in seen:
+                seen.add(cover)
+                covers.append(list(reversed(chosen)))
+            return
+        for previous, mask in parents[state]:
+            walk(previous, chosen + [mask])
+
+    walk(best, [])
+    return covers
+
+def cover_requirements(catalog, requirements, feasible, limit=PLANS, max_courses=MAX_COURSES) -> dict:
+    """
+    cover_requirements: small sets of feasible courses covering the most outstanding requirements
+        requirements: list of (name, bitset of satisfying courses), in display order
+        feasible: bitset of courses the student can take (see feasible_bits)
+        returns {"coverable": names some feasible course covers, "uncoverable": names no feasible course covers,
+                 "plans": [{"courses": [{"id", "covers", "alternatives"}], "covers": names}],
+                 "exact": False if the plans came from greedy set cover}
+    """
+    names = [name for name, _ in requirements]
+    masks = course_masks(requirements, feasible)
+    reachable = 0
+    for mask in masks.values():
+        reachable |= mask
+
+    # courses per mask, alphabetical within a mask
+    by_mask = {}
+    for i in sorted(masks, key=lambda i: catalog.ids[i]):
+        by_mask.setdefault(masks[i], []).append(i)
+    options = undominated(by_mask)
+
+    covers = None
+    if len(requirements) <= EXACT_LIMIT:
+        covers = exact_covers(options, reachable, max_courses, limit)
+    exact = covers is not None
+    if not exact:
+        covers = [greedy_cover(options, reachable, max_courses)]
+
+    def labels(mask):
+        return [names[r] for r in iter_bits(mask)]
+
+    plans = []
+    for cover in covers:
+        if not cover:
+            continue
+        picks = []
+        for n, mask in enumerate(cover):
+            # swapping in any course that still covers what only this pick covers keeps the plan's coverage
+            others = 0
+            for m, other in enumerate(cover):
+                if m != n:
+                    others |= other
+            needed = mask & ~others
+            pick = by_mask[mask][0]
+            swaps = sorted((i for i, course_mask in masks.items() if i != pick and course_mask & needed == needed),
+                           key=lambda i: (-bin(masks[i]).count("1"), catalog.ids[i]))
+            picks.append({"id": catalog.ids[pick], "covers": labels(mask),
+                          "alternatives": [catalog.ids[i] for i in swaps[:ALTERNATIVES]]})
+        covered = 0
+        for mask in cover:
+            covered |= mask
+        plans.append({"courses": picks, "covers": labels(covered)})
+
+    return {
+        "coverable": labels(reachable),
+        "uncoverable": [name for r, name in enumerate(names) if not reachable >> r & 1],
+        "plans": plans,
+        "exact": exact
+    }
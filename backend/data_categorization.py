@@ -1,86 +1,117 @@
-import json
+import sqlite3
+import sys
 
-""" Load data from api.json into separate smaller indexes using course ID: 
+from json_stream import iter_json_array
+
+""" Build smaller indexes over the course records using course ID:
     - by department
-    - by instructor 
+    - by instructor
     - by upper/lower division level
-    - by GE category """
-
-# open all_course_data.json to read from
-with open("all_course_data.json", "r") as f:
-    all_course_data = json.load(f)
-
-# for error checking 
-# print(f"Total courses loaded: {len(all_course_data)}")
-
-# create department index
-""" Department index will be used to recommend major/minor related courses """
-dept_index = {}
-
-for c in all_course_data:
-    course_id = c["id"]
-    dept = c["department"]
-
-    if dept not in dept_index:
-        dept_index[dept] = []
-
-    dept_index[dept].append(course_id)
-
-with open("dept_index.json", "w") as f:
-    json.dump(dept_index, f, indent=2)
-
-# create instructor index --> map instructor to course
-""" Instructor index will be used to choose preferred professors and may recommend classes based on those selected"""
-instructor_index = {}
-
-for c in all_course_data:
-    course_id = c["id"]
-    instructors = c.get("instructors", [])
-
-    for instr in instructors:
-        name = instr["name"]
-
-        if name not in instructor_index:
-            instructor_index[name] = []
-        
-        instructor_index[name].append(course_id)
-
-with open("instructor_index.json", "w") as f:
-    json.dump(instructor_index, f, indent=2)
-
-# create level index to denote upper/lower division courses 
-""" Level index will be used to recommend courses based on class standing """
-level_index = {}
-
-for c in all_course_data:
-    course_id = c["id"]
-    level = c.get("courseLevel", "Unknown")
-
-    if level not in level_index:
-        level_index[level] = []
-    
-    level_index[level].append(course_id)
-
-with open("level_index.json", "w") as f:
-    json.dump(level_index, f, indent=2)
-
-# create GE index to organize courses into GE categories
-""" GE index will be used to recommend courses based on GE requirements left for graduation """
-ge_index = {}
-
-for c in all_course_data:
-    course_id = c["id"]
-
-    ge_list = c.get("geList", [])
-
-    if not ge_list:
-        continue
-
-    for ge in ge_list:
-        if ge not in ge_index:
-            ge_index[ge] = []
-        
-        ge_index[ge].append(course_id)
-
-with open("ge_index.json", "w") as f:
-    json.dump(ge_index, f, indent=2)
+    - by GE category
+
+    All indexes are filled in one pass over the records and stored in the
+    CourseIndex table of courses.db, so they load without re-parsing all_course_data.json.
+
+    Usage:
+        indexes = build_indexes(iter_json_array("all_course_data.json"))
+        save_indexes("courses.db", indexes)
+        load_course_index("ge", "courses.db")
+"""
+
+DB_PATH = "courses.db"
+
+# index name --> function returning the keys a course is filed under
+INDEX_TYPES = {}
+
+def register_index(name, key_fn):
+    """
+    register_index: adds an index type built by build_indexes
+        key_fn: takes a course record, returns the keys it belongs to
+    """
+    INDEX_TYPES[name] = key_fn
+
+def dept_keys(course):
+    """ Department index will be used to recommend major/minor related courses """
+    return [course["department"]]
+
+def instructor_keys(course):
+    """ Instructor index will be used to choose preferred professors and may recommend classes based on those selected """
+    return [instr["name"] for instr in course.get("instructors", [])]
+
+def level_keys(course):
+    """ Level index will be used to recommend courses based on class standing """
+    return [course.get("courseLevel", "Unknown")]
+
+def ge_keys(course):
+    """ GE index will be used to recommend courses based on GE requirements left for graduation """
+    return course.get("geList", [])
+
+register_index("dept", dept_keys)
+register_index("instructor", instructor_keys)
+register_index("level", level_keys)
+register_index("ge", ge_keys)
+
+def build_indexes(courses, index_types=None):
+    """
+    build_indexes: fills every index in one pass over the course records
+        courses: any iterable of course dicts (e.g. iter_json_array)
+        index_types: {name: key_fn}, defaults to every registered index
+        returns {index name: {key: [course ids]}}
+    """
+    if index_types is None:
+        index_types = INDEX_TYPES
+    indexes = {name: {} for name in index_types}
+
+    for course in courses:
+        course_id = course["id"]
+        for name, key_fn in index_types.items():
+            index = indexes[name]
+            for key in key_fn(course):
+                ids = index.setdefault(key, [])
+                # a course lists the same key twice at most back to back
+                if not ids or ids[-1] != course_id:
+                    ids.append(course_id)
+    return indexes
+
+def save_indexes(db_path, indexes):
+    """
+    save_indexes: replaces the stored rows of each index in CourseIndex
+    """
+    conn = sqlite3.connect(db_path)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS CourseIndex (
+            index_name TEXT,
+            key TEXT,
+            course_id TEXT,
+            PRIMARY KEY (index_name, key, course_id)
+        ) WITHOUT ROWID
+    ''')
+    with conn:
+        for name, index in indexes.items():
+            conn.execute("DELETE FROM CourseIndex WHERE index_name = ?", (name,))
+            conn.executemany('''
+                INSERT OR IGNORE INTO CourseIndex(index_name, key, course_id)
+                VALUES (?, ?, ?)
+            ''', ((name, key, cid) for key, ids in index.items() for cid in ids))
+    conn.close()
+
+def load_course_index(name, db_path=DB_PATH):
+    """
+    load_course_index: reads one stored index back as {key: [course ids]}
+    """
+    conn = sqlite3.connect(db_path)
+    index = {}
+    rows = conn.execute("SELECT key, course_id FROM CourseIndex WHERE index_name = ?", (name,))
+    for key, course_id in rows:
+        index.setdefault(key, []).append(course_id)
+    conn.close()
+    return index
+
+def main(json_path="all_course_data.json", db_path=DB_PATH):
+    indexes = build_indexes(iter_json_array(json_path))
+    save_indexes(db_path, indexes)
+    for name, index in indexes.items():
+        print(f"{name} index: {len(index)} keys")
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -1,30 +1,105 @@
-import requests
 import json
-import time
+import os
+import threading
+
+from fetcher import Fetcher
+from http_cache import ResponseCache
+from json_stream import write_json_array
 
 """ Load data from Anteater API into json files """
 
-COURSEDATA_URL = "https://anteaterapi.com/v2/rest/coursesCursor" # load API url
-MAJOR_URL = "https://anteaterapi.com/v2/rest/programs/majors"
-MINOR_URL = "https://anteaterapi.com/v2/rest/programs/minors"
-TERM_URL = "https://anteaterapi.com/v2/rest/websoc/terms"
+# point at stub_api.py for local runs
+API_URL = os.environ.get("ANTEATER_API_URL", "https://anteaterapi.com/v2/rest")
+
+COURSEDATA_URL = f"{API_URL}/coursesCursor" # load API url
+MAJOR_URL = f"{API_URL}/programs/majors"
+MINOR_URL = f"{API_URL}/programs/minors"
+TERM_URL = f"{API_URL}/websoc/terms"
+WEBSOC_URL = f"{API_URL}/websoc"
 
 TAKE = 100 # load data in batches
-SLEEP_TIME = 0.5 # avoid overloading api
 
-def fetch_courses(cursor=None, take=TAKE):
+# fetch_courses writes each batch here so an interrupted run can resume
+CHECKPOINT_DIR = "course_batches"
+CHECKPOINT_FILE = "checkpoint.json"
+
+# responses are cached on disk and revalidated once stale (see http_cache.py)
+CACHE_PATH = os.environ.get("ANTEATER_CACHE_PATH", "http_cache.db")
+
+# every request goes through this --> rate limit, concurrency cap, retries and caching (see fetcher.py)
+# created on first use so importing this module never opens the cache file
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+def get_fetcher() -> Fetcher:
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = Fetcher(cache=ResponseCache(CACHE_PATH))
+    return _fetcher
+
+def _write_atomic(path, text):
+    # write then rename --> a crash never leaves a half written file behind
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def _load_checkpoint(checkpoint_dir):
+    path = os.path.join(checkpoint_dir, CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r") as f:
+        return json.load(f)
+
+def iter_saved_courses(checkpoint_dir=CHECKPOINT_DIR):
+    """
+    iter_saved_courses: yields the course records stored by fetch_courses, one batch file at a time
+    """
+    segments = sorted(name for name in os.listdir(checkpoint_dir) if name.endswith(".ndjson"))
+    for name in segments:
+        with open(os.path.join(checkpoint_dir, name), "r") as f:
+            for line in f:
+                yield json.loads(line)
+
+def fetch_courses(cursor=None, take=TAKE, checkpoint_dir=CHECKPOINT_DIR, resume=True):
+    """
+    fetch_courses: pages through the course catalog and saves it to all_course_data.json
+        cursor: page to start from (overrides a saved checkpoint)
+        checkpoint_dir: every batch is written here as an NDJSON segment as soon as it arrives,
+                        checkpoint.json records the cursor of the next batch
+        resume: continue an interrupted run from checkpoint.json instead of starting over,
+                a finished run always starts over so the catalog is fetched fresh
+
+    Only one batch is held in memory at a time. The segments are kept after the
+    run (main reads them again to attach sections), checkpoint.json is removed.
+    returns the number of courses saved
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
     batch_number = 1
-    all_courses = []
-
-    while True:
+    checkpoint = _load_checkpoint(checkpoint_dir) if resume else None
+    if checkpoint is not None and checkpoint["done"]:
+        # left behind by a run that finished --> nothing to resume
+        checkpoint = None
+
+    if checkpoint is None:
+        # fresh run --> drop segments from an earlier run
+        for name in os.listdir(checkpoint_dir):
+            if name.endswith(".ndjson"):
+                os.remove(os.path.join(checkpoint_dir, name))
+    elif cursor is None:
+        cursor = checkpoint["next_cursor"]
+        batch_number = checkpoint["batch_number"]
+        print(f"Resuming at batch {batch_number}")
+
+    while checkpoint is None or not checkpoint["done"]:
         params = {"take": take}
 
         if cursor is not None:
             params["cursor"] = cursor
 
-        response = requests.get(COURSEDATA_URL, params=params)
-        response.raise_for_status()
-        data = response.json().get("data")
+        data = get_fetcher().get_json(COURSEDATA_URL, params).get("data")
 
         # check if data exists --> prevent crashes
         if data is None:
@@ -35,102 +110,81 @@ def fetch_courses(cursor=None, take=TAKE):
             items = data.get("items", [])
             cursor = data.get("nextCursor")
 
-        # store batch
-        all_courses.extend(items)
+        # normalize terms
+        for course in items:
+            if course.get("terms") and isinstance(course["terms"][0], str):
+                course["terms"] = [{"term": t, "sections": []} for t in course["terms"]]
+
+        # store batch, then move the checkpoint past it
+        segment = os.path.join(checkpoint_dir, f"batch_{batch_number:06d}.ndjson")
+        _write_atomic(segment, "".join(json.dumps(course) + "\n" for course in items))
 
         print(f"Batch {batch_number}: Fetched {len(items)} courses")
         batch_number += 1
 
-        # stop if no more data
-        if not cursor:
-            break
-
-    # normalize terms
-    for course in all_courses:
-        if course.get("terms") and isinstance(course["terms"][0], str):
-            course["terms"] = [{"term": t, "sections": []} for t in course["terms"]]
+        checkpoint = {"next_cursor": cursor, "batch_number": batch_number, "done": not cursor}
+        _write_atomic(os.path.join(checkpoint_dir, CHECKPOINT_FILE), json.dumps(checkpoint))
 
     # save initial course data --> term data will be added later
-    with open("all_course_data.json", "w") as f:
-        json.dump(all_courses, f, indent=2)
+    total = write_json_array("all_course_data.json", iter_saved_courses(checkpoint_dir))
+    # the next call fetches the catalog again instead of resuming this finished run
+    os.remove(os.path.join(checkpoint_dir, CHECKPOINT_FILE))
 
-    print(f"Total courses saved to course_information.json: {len(all_courses)}")
+    print(f"Total courses saved to all_course_data.json: {total}")
 
-    return all_courses
+    return total
 
-def fetch_majors():
-    response = requests.get(MAJOR_URL)
-    response.raise_for_status()
-    majors = response.json().get("data", [])
+def fetch_program(kind, program_id):
+    """
+    fetch_program: requirements for one major or minor
+        kind: "major" or "minor"
+    """
+    return get_fetcher().get_json(f"{API_URL}/programs/{kind}", {"programId": program_id}).get("data", [])
+
+def fetch_programs(kind, list_url):
+    programs = get_fetcher().get_json(list_url).get("data", [])
 
     # check if data exists
-    if majors is None:
+    if not programs:
         return []
-    
-    # fetch requirements for each major
-    all_major_data = []
-
-    # retrieve all major ids and extract data from api
-    for major in majors:
-        program_id = major["id"]
-        URL = f"https://anteaterapi.com/v2/rest/programs/major?programId={program_id}"
-        response = requests.get(URL)
-        response.raise_for_status()
-        requirements = response.json().get("data", [])
-
-        # merge major information with requirements
-        major_copy = major.copy()
-        major_copy["requirements"] = requirements
-
-        all_major_data.append(major_copy)
-        time.sleep(SLEEP_TIME)  # sleep 100ms between requests --> avoid client error
-    
+
+    # fetch requirements for each program concurrently, results keep the listing order
+    requirements = get_fetcher().map(lambda program: fetch_program(kind, program["id"]), programs)
+
+    # merge program information with requirements
+    all_program_data = []
+    for program, reqs in zip(programs, requirements):
+        program_copy = program.copy()
+        program_copy["requirements"] = reqs
+        all_program_data.append(program_copy)
+
+    return all_program_data
+
+def fetch_majors():
+    all_major_data = fetch_programs("major", MAJOR_URL)
+
     # write to json file
     with open("all_major_data.json", "w") as f:
         json.dump(all_major_data, f, indent=2)
 
     print(f"Saved {len(all_major_data)} majors.")
+    return all_major_data
 
 def fetch_minors():
-    response = requests.get(MINOR_URL)
-    response.raise_for_status()
-    minors = response.json().get("data", [])
+    all_minor_data = fetch_programs("minor", MINOR_URL)
 
-    # check if data exists
-    if not minors:
-        return []
-    
-    # fetch requirements for each minor
-    all_minor_data = []
-
-    # retrieve all minor ids and extract data from api
-    for minor in minors:
-        program_id = minor["id"]
-        URL = f"https://anteaterapi.com/v2/rest/programs/minor?programId={program_id}"
-        response = requests.get(URL)
-        response.raise_for_status()
-        requirements = response.json().get("data", [])
-
-        # merge minor information with requirements
-        minor_copy = minor.copy()
-        minor_copy["requirements"] = requirements
-
-        all_minor_data.append(minor_copy)
-        time.sleep(SLEEP_TIME)  # sleep 100ms between requests --> avoid client error
-    
     # write to json file
     with open("all_minor_data.json", "w") as f:
         json.dump(all_minor_data, f, indent=2)
 
     print(f"Saved {len(all_minor_data)} minors.")
+    return all_minor_data
 
 def fetch_specializations():
     pass
 
 def fetch_terms():
-    response = requests.get(TERM_URL)
-    response.raise_for_status()
-    term_list = response.json().get("data", [])
+    term_list = get_fetcher().get_json(TERM_URL).get("data", [])
 
     terms = []
 
@@ -145,14 +199,18 @@ def fetch_terms():
     
     return terms
 
-def fetch_term_info(year, quarter):
+def fetch_term_data(year, quarter):
     # query websoc
-    URL = f"https://anteaterapi.com/v2/rest/websoc?year={year}&quarter={quarter}"
-    response = requests.get(URL)
-    response.raise_for_status()
-    data = response.json().get("data", [])
+    return get_fetcher().get_json(WEBSOC_URL, {"year": year, "quarter": quarter}).get("data", [])
 
+def parse_term_info(data, year, quarter):
+    """
+    parse_term_info: flattens one term of websoc data into one offering per section meeting
+        pure function of its arguments so terms can be parsed on separate threads
+    """
     extracted = []
+    if not data:
+        return extracted
 
     # websoc structure: schools --> depts --> courses --> sections --> meeting info
     for school in data.get("schools", []):
@@ -171,11 +229,12 @@ def fetch_term_info(year, quarter):
                         else:
                             meeting_location = meeting_location[0].split()
                             building = meeting_location[0]
-                            room = meeting_location[1]
+                            room = meeting_location[1] if len(meeting_location) > 1 else ""
                         extracted.append({
                             "department": dept_code, 
                             "courseNumber": course.get("courseNumber"),
                             "sectionCode": section.get("sectionCode"),
+                            "sectionType": section.get("sectionType"),
                             "buildingCode": building,
                             "roomNumber": room,
                             "startTime": meeting.get("startTime"),
@@ -186,53 +245,72 @@ def fetch_term_info(year, quarter):
 
     return extracted
 
-def build_course_lookup(all_courses):
-    lookup = {}
-    for course in all_courses:
-        key = (course["department"], course["courseNumber"])
-        lookup[key] = course
-    return lookup
-
-def merge_offerings(all_courses, offerings):
-    course_lookup = build_course_lookup(all_courses)
-
+def fetch_term_info(year, quarter):
+    return parse_term_info(fetch_term_data(year, quarter), year, quarter)
+
+def build_offering_index(offerings, index=None):
+    """
+    build_offering_index: groups offerings by (department, courseNumber, term)
+        index: existing index to add to, so one index can hold every term
+        returns {(department, courseNumber, term): [section, ...]}
+    """
+    if index is None:
+        index = {}
     for offering in offerings:
-        key = (offering["department"], offering["courseNumber"])
-
-        if key not in course_lookup:
-            continue
-
-        course = course_lookup[key]
-        term_string = offering["term"]
-
-        # find matching term object
-        for term in course["terms"]:
-            if term["term"] == term_string:
-                term["sections"].append({
-                    "sectionCode": offering["sectionCode"],
-                    "building": offering["building"],
-                    "room": offering["room"],
-                    "startTime": offering["startTime"],
-                    "endTime": offering["endTime"],
-                    "days": offering["days"]
-                })
-                break
+        key = (offering["department"], offering["courseNumber"], offering["term"])
+        index.setdefault(key, []).append({
+            "sectionCode": offering["sectionCode"],
+            "sectionType": offering["sectionType"],
+            "building": offering["buildingCode"],
+            "room": offering["roomNumber"],
+            "startTime": offering["startTime"],
+            "endTime": offering["endTime"],
+            "days": offering["days"]
+        })
+    return index
+
+def attach_sections(course, offering_index):
+    # one dict lookup per term the course lists
+    for term in course.get("terms", []):
+        sections = offering_index.get((course["department"], course["courseNumber"], term["term"]))
+        if sections:
+            term["sections"].extend(sections)
+    return course
 
-if __name__ == "__main__":
+def merge_offerings(all_courses, offerings):
+    offering_index = build_offering_index(offerings)
+    for course in all_courses:
+        attach_sections(course, offering_index)
+
+def fetch_term_index(year, quarter):
+    # the decoded websoc tree only lives until its term is indexed
+    return build_offering_index(fetch_term_info(year, quarter))
+
+def fetch_offering_index(terms):
+    """
+    fetch_offering_index: one offering index across all terms
+        each of get_fetcher()'s threads downloads, parses and indexes its own term,
+        so at most max_concurrency terms are in memory and nothing is pickled
+    """
+    print(f"Fetching WebSOC for {len(terms)} terms")
+    offering_index = {}
+    for _, term_index in get_fetcher().as_completed(lambda term: fetch_term_index(*term), terms):
+        # keys include the term --> terms never collide
+        offering_index.update(term_index)
+    return offering_index
+
+def main():
     fetch_majors()
     fetch_minors()
 
-    all_courses = fetch_courses()
-    # with open("all_course_data.json", "r") as f:
-    #     all_courses = json.load(f)
+    fetch_courses()
     terms = fetch_terms()
+    offering_index = fetch_offering_index(terms)
 
-    # fetch websoc offering per term and merge information into all_course_data
-    for year, quarter in terms:
-        print(f"Fetching WebSOC for {year} {quarter}")
-        offerings = fetch_term_info(year, quarter)
-        merge_offerings(all_courses, offerings)
-        time.sleep(0.6)
+    # stream the saved batches, attach each course's sections and write the merged catalog
+    merged = (attach_sections(course, offering_index) for course in iter_saved_courses())
+    total = write_json_array("all_course_data.json", merged)
+    print(f"Merged section data into {total} courses")
 
-    with open("all_course_data.json", "w") as f:
-       json.dump(all_courses, f, indent=2)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+from datetime import date
+
+from catalog import iter_bits, to_bits
+
+""" Multi-quarter degree plans on top of the search catalog and prerequisite graph
+
+    Terms only holds offerings that were already published, so terms past the
+    last listed one are projected: a course is expected in a quarter it was
+    offered in during any listed year (its quarter pattern).
+"""
+
+MAX_UNITS = 16 # units per quarter unless the student asks for more
+MAX_QUARTERS = 12 # four years without summers
+
+# position of a quarter inside its calendar year, fall 2025 comes before winter 2026
+QUARTER_ORDER = {"winter": 0, "spring": 1, "summer1": 2, "summer10wk": 2, "summer2": 3, "summer": 2, "fall": 4}
+SUMMER_QUARTERS = {"summer1", "summer10wk", "summer2", "summer"}
+
+# month --> quarter in session (or about to start) then, September counts toward fall
+MONTH_QUARTERS = {1: "winter", 2: "winter", 3: "winter", 4: "spring", 5: "spring", 6: "spring",
+                  7: "summer", 8: "summer", 9: "fall", 10: "fall", 11: "fall", 12: "fall"}
+
+def listed_terms(catalog) -> set:
+    # (year, quarter) pairs with offerings in Terms
+    return {(y, q) for y, q, t, f in catalog.terms if y and q and t is None and f is None}
+
+def current_term(today=None) -> tuple:
+    """
+    current_term: (year, quarter) in session on today, or about to start ("summer" in July and August)
+    """
+    today = today or date.today()
+    return today.year, MONTH_QUARTERS[today.month]
+
+def plan_terms(catalog, year=None, quarter=None, count=MAX_QUARTERS, include_summer=False) -> list:
+    """
+    plan_terms: count consecutive (year, quarter) pairs in calendar order, listed in Terms or not
+        year, quarter: first term of the plan, None to start at the current term (see current_term)
+        include_summer: also plan the summer sessions that appear in Terms
+    """
+    listed = listed_terms(catalog)
+    summers = sorted({q for _, q in listed if q in SUMMER_QUARTERS}, key=lambda q: (QUARTER_ORDER[q], q))
+    calendar = ["winter", "spring"] + (summers if include_summer else []) + ["fall"]
+
+    if not (year and quarter):
+        year, quarter = current_term()
+    year, quarter = int(year), quarter.lower()
+    # a quarter that is not planned (a summer without include_summer) starts the plan at the next one
+    position = QUARTER_ORDER.get(quarter, len(QUARTER_ORDER))
+    index = next((n for n, q in enumerate(calendar) if (QUARTER_ORDER[q], q) >= (position, quarter)), None)
+    if index is None:
+        year, index = year + 1, 0
+
+    terms = []
+    while len(terms) < count:
+        terms.append((year, calendar[index]))
+        index += 1
+        if index == len(calendar):
+            year, index = year + 1, 0
+    return terms
+
+def term_offerings(catalog, term, listed=None) -> int:
+    """
+    term_offerings: bitset of the courses offered in term, projected from every listed
+        year's same quarter when term itself is not in Terms
+    """
+    listed = listed_terms(catalog) if listed is None else listed
+    if term in listed:
+        return catalog.term_bits(*term)
+    bits = 0
+    for year, quarter in listed:
+        if quarter == term[1]:
+            bits |= catalog.term_bits(year, quarter)
+    return bits
+
+def plan_degree(graph, query, year=None, quarter=None, quarters=MAX_QUARTERS,
+                max_units=MAX_UNITS, include_summer=False) -> dict:
+    """
+    plan_degree: assigns the courses of query's majors and minors (and the prerequisites they need)
+        to upcoming terms, never more than max_units (summed Courses.min_units) in one term
+        graph: PrereqGraph of the current database load
+        query: CourseQuery, its completed courses are never planned again
+        year, quarter: first term of the plan, None for the current term
+        returns {"terms": [{"year", "quarter", "courses", "units", "projected"}], "unplaced": [course ids]},
+            "projected" is True for terms not in Terms, whose offerings come from the quarter pattern
+
+    Each course keeps a count of its prerequisites that are still missing, and the
+    frontier of courses at zero is updated from the courses just planned instead
+    of re-running the search for every term. Courses with the longest chain of
+    planned dependents above them are placed first.
+    """
+    catalog = graph.catalog
+    offsets, targets = catalog.prereq_offsets, catalog.prereq_targets
+    done = catalog.bits(query.completed)
+    wanted = (catalog.union(catalog.majors, query.majors) | catalog.union(catalog.minors, query.minors)) & ~done
+
+    needed = wanted
+    for i in iter_bits(wanted):
+        needed |= graph.ancestors[i]
+    needed &= ~done
+
+    # missing prerequisites per needed course, and the frontier of those with none left
+    unmet = {}
+    ready = 0
+    for i in iter_bits(needed):
+        missing = sum(1 for j in range(offsets[i], offsets[i + 1]) if not done >> targets[j] & 1)
+        unmet[i] = missing
+        if missing == 0:
+            ready |= 1 << i
+
+    # longest chain of needed dependents, filled in dependents first
+    height = {}
+    for i in reversed(graph.order):
+        if i in unmet:
+            height[i] = max((height[d] + 1 for d in _dependents(graph, i) if d in unmet), default=0)
+
+    plan = []
+    remaining = needed
+    listed = listed_terms(catalog)
+    for term in plan_terms(catalog, year, quarter, quarters, include_summer):
+        if not remaining:
+            break
+        offered = ready & term_offerings(catalog, term, listed)
+        chosen = []
+        units = 0
+        for i in sorted(iter_bits(offered), key=lambda i: (-height[i], catalog.ids[i])):
+            course_units = _units(catalog, i)
+            if units + course_units <= max_units:
+                chosen.append(i)
+                units += course_units
+
+        # courses taken this term unlock dependents for the next one, not this one
+        taken = to_bits(chosen)
+        ready &= ~taken
+        remaining &= ~taken
+        for i in chosen:
+            for d in _dependents(graph, i):
+                if d in unmet:
+                    unmet[d] -= 1
+                    if unmet[d] == 0:
+                        ready |= 1 << d
+        plan.append({"year": term[0], "quarter": term[1],
+                     "courses": [catalog.ids[i] for i in chosen], "units": units,
+                     "projected": term not in listed})
+
+    unplaced = sorted(iter_bits(remaining), key=lambda i: (graph.levels[i], catalog.ids[i]))
+    return {"terms": plan, "unplaced": [catalog.ids[i] for i in unplaced]}
+
+def _dependents(graph, i):
+    return graph.required_by[graph.required_offsets[i]:graph.required_offsets[i + 1]]
+
+def _units(catalog, i):
+    row = catalog.courses[i]
+    return row[4] if row is not None else 0
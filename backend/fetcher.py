@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+""" Concurrent, rate-limited HTTP fetching for data_collection """
+
+RATE_LIMIT = 2.0 # requests per second across all threads
+BURST = 4 # requests allowed back to back before the rate limit applies
+MAX_CONCURRENCY = 4 # requests in flight at once
+MAX_RETRIES = 5
+BACKOFF = 0.5 # seconds, doubled after every failed attempt
+TIMEOUT = 30
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class TokenBucket():
+    """
+
+    Token bucket rate limiter shared by every thread of a Fetcher
+
+    Member Variables:
+        -rate: tokens added per second
+        -capacity: most tokens the bucket can hold (burst size)
+
+    """
+    def __init__(self, rate=RATE_LIMIT, capacity=BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+class Fetcher():
+    """
+
+    Runs GET requests from a thread pool under a shared rate limit
+
+    Member Variables:
+        -bucket: TokenBucket every request waits on
+        -max_concurrency: size of the thread pool and cap on requests in flight
+        -max_retries: attempts after the first one for 429/5xx and connection errors
+        -backoff: base delay between retries (exponential with jitter, Retry-After wins)
+        -cache: optional ResponseCache consulted by get_json (see http_cache.py)
+
+    To fetch:
+        -get_json(url, params) for a single request
+        -map(fn, items) to run fn over items concurrently, results keep the order of items
+        -as_completed(fn, items) to get (item, result) pairs as soon as each one finishes
+
+    """
+    def __init__(self, rate=RATE_LIMIT, burst=BURST, max_concurrency=MAX_CONCURRENCY,
+                 max_retries=MAX_RETRIES, backoff=BACKOFF, cache=None):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.cache = cache
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._local = threading.local()
+
+    def _session(self):
+        # requests.Session is not thread safe --> one per thread, reusing keep-alive connections
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def _retry_delay(self, attempt, response=None):
+        if response is not None:
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return int(retry_after)
+        return self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+
+    def get(self, url, params=None, headers=None):
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            try:
+                with self._slots:
+                    response = self._session().get(url, params=params, headers=headers, timeout=TIMEOUT)
+            except requests.ConnectionError:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt))
+                attempt += 1
+                continue
+
+            if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                time.sleep(self._retry_delay(attempt, response))
+                attempt += 1
+                continue
+
+            response.raise_for_status()
+            return response
+
+    def get_json(self, url, params=None):
+        if self.cache is not None:
+            return self.cache.get_json(self, url, params)
+        return self.get(url, params).json()
+
+    def map(self, fn, items):
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            return list(pool.map(fn, items))
+
+    def as_completed(self, fn, items):
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = {pool.submit(fn, item): item for item in items}
+            for future in as_completed(futures):
+                # drop the future's reference so a consumed result can be freed
+                yield futures.pop(future), future.result()
@@ -0,0 +1,159 @@
+import json
+import re
+from functools import lru_cache
+
+from autocomplete import compact, DEPARTMENT_ALIASES
+from connection import get_connection
+from text_index import tokenize
+
+""" Typo tolerant matching of course titles and codes
+
+    CourseTrigrams holds the distinct trigrams of each course's title words and
+    compact id. A query's trigrams pick the courses sharing the most of them,
+    and only those candidates are checked with edit distance, so a fuzzy lookup
+    never scores the whole catalog.
+"""
+
+MAX_CANDIDATES = 200 # courses reranked by edit distance per query
+DISTANCE_CACHE = 1 << 16 # (token, word) distances remembered, titles share most of their words
+
+# characters typed for digits in course numbers, "3l" --> "31"
+DIGIT_LOOKALIKES = str.maketrans({"l": "1", "i": "1", "o": "0"})
+
+def allowed_edits(token) -> int:
+    # typos tolerated in a token, short tokens must match exactly
+    if len(token) <= 2:
+        return 0
+    return 1 if len(token) <= 5 else 2
+
+def trigrams(word) -> set:
+    # "sci" --> {"  s", " sc", "sci", "ci "}, the padding lets short words and word starts match
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def course_words(course_id, title) -> list:
+    # words a query is matched against: title tokens and the compact course id
+    return tokenize(title) + [compact(course_id)]
+
+def trigram_rows(course: dict) -> list:
+    """
+    trigram_rows: CourseTrigrams rows for one course record from all_course_data.json
+    """
+    grams = set()
+    for word in course_words(course["id"], course.get("title", "")):
+        grams |= trigrams(word)
+    return [(course["id"], gram) for gram in sorted(grams)]
+
+def edit_distance(a, b, limit) -> int:
+    """
+    edit_distance: insertions, deletions, substitutions and adjacent swaps turning a into b
+        stops early and returns limit + 1 once the distance is known to exceed limit
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if before is not None and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+@lru_cache(maxsize=DISTANCE_CACHE)
+def word_distance(token, word, limit) -> int:
+    # a token may also be a mistyped start of the word, "sci" matches "science"
+    if word.startswith(token):
+        return 0
+    return min(edit_distance(token, word, limit), edit_distance(token, word[:len(token)], limit))
+
+def code_key(query) -> str:
+    # "ics 3l" --> "icsci31", compared against compact course ids
+    key = compact(query)
+    match = re.match(r"[a-z]+", key)
+    if not match:
+        return key
+    letters, number = match.group(), key[match.end():]
+    if number[:1].isdigit():
+        number = number[0] + number[1:].translate(DIGIT_LOOKALIKES)
+    return DEPARTMENT_ALIASES.get(letters, letters) + number
+
+def similarity(tokens, code, course_id, title):
+    """
+    similarity: 0..1 match of a query (its tokens and code_key) against one course, None when it is too far off
+        the course matches if its compact id is within the typo allowance of the compact
+        query, or if every query token is within its allowance of some title word
+    """
+    best = None
+    if code:
+        limit = allowed_edits(code)
+        distance = edit_distance(code, compact(course_id), limit)
+        if distance <= limit:
+            best = 1 - distance / len(code)
+
+    words = course_words(course_id, title)
+    total = 0
+    for token in tokens:
+        limit = allowed_edits(token)
+        distance = min((word_distance(token, word, limit) for word in words), default=limit + 1)
+        if distance > limit:
+            return best
+        total += distance
+    if tokens:
+        score = 1 - total / sum(len(token) for token in tokens)
+        best = score if best is None else max(best, score)
+    return best
+
+def unknown_terms(query: str, db_path: str) -> set:
+    """
+    unknown_terms: query tokens that appear in no course at all, most likely typos
+    """
+    tokens = set(tokenize(query))
+    if not tokens:
+        return set()
+    rows = get_connection(db_path).execute('''
+        SELECT DISTINCT term FROM InvertedCourseIndex WHERE term IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(list(tokens)),)).fetchall()
+    return tokens - {term for term, in rows}
+
+def fuzzy_search(query: str, db_path: str, k: int = 10) -> list[tuple]:
+    """
+    fuzzy_search: courses whose title or code is within a few typos of the query
+        returns up to k (course_id, similarity) pairs, best first
+    """
+    tokens = tokenize(query)
+    code = code_key(query)
+    grams = set()
+    for word in tokens + [code]:
+        if word:
+            grams |= trigrams(word)
+    if not grams:
+        return []
+
+    conn = get_connection(db_path)
+    # count shared trigrams off the covering index first, titles are only looked up for the candidates
+    candidates = conn.execute('''
+        SELECT s.course_id, s.shared, c.course_title
+        FROM (
+            SELECT course_id, COUNT(*) AS shared
+            FROM CourseTrigrams
+            WHERE trigram IN (SELECT value FROM json_each(?))
+            GROUP BY course_id
+            ORDER BY shared DESC, course_id
+            LIMIT ?
+        ) s
+        JOIN Courses c ON c.course_id = s.course_id
+    ''', (json.dumps(list(grams)), MAX_CANDIDATES)).fetchall()
+
+    scored = []
+    for cid, shared, title in candidates:
+        score = similarity(tokens, code, cid, title)
+        if score is not None:
+            scored.append((cid, score, shared))
+    scored.sort(key=lambda item: (-item[1], -item[2], item[0]))
+    return [(cid, score) for cid, score, _ in scored[:k]]
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+""" On-disk cache for Anteater API responses, used by Fetcher.get_json """
+
+CACHE_PATH = "http_cache.db"
+CACHE_TTL = 24 * 60 * 60 # seconds a response is served without asking the API
+MAX_CACHE_BYTES = 512 * 1024 * 1024 # least recently used entries are evicted past this
+
+class ResponseCache():
+    """
+
+    Response cache keyed by url and query params, stored in a SQLite file
+
+    Member Variables:
+        -path: path to the cache database
+        -ttl: seconds an entry is fresh, stale entries are revalidated with
+              If-None-Match / If-Modified-Since before they are reused
+        -max_bytes: size bound for all cached bodies
+        -hits, revalidated, misses: counters for the current process
+
+    """
+    def __init__(self, path=CACHE_PATH, ttl=CACHE_TTL, max_bytes=MAX_CACHE_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS Responses (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                body BLOB NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size INTEGER NOT NULL
+            );
+
+            CREATE INDEX IF NOT EXISTS idx_response_access
+            ON Responses(last_access);
+        ''')
+
+    @staticmethod
+    def key(url, params=None):
+        full_url = url
+        if params:
+            full_url += "?" + urlencode(sorted(params.items()))
+        return hashlib.sha256(full_url.encode()).hexdigest()
+
+    def lookup(self, key):
+        """
+        lookup: cached entry for key as (body, etag, last_modified, fresh), None on a miss
+        """
+        with self._lock:
+            row = self._conn.execute('''
+                SELECT body, etag, last_modified, stored_at FROM Responses WHERE key = ?
+            ''', (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE Responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        body, etag, last_modified, stored_at = row
+        return body, etag, last_modified, time.time() - stored_at < self.ttl
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry is not None:
+            _, etag, last_modified, _ = entry
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def refresh(self, key):
+        # 304 Not Modified --> the cached body is fresh again
+        with self._lock:
+            self._conn.execute("UPDATE Responses SET stored_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+    def store(self, key, url, body: bytes, etag=None, last_modified=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute('''
+                INSERT OR REPLACE INTO Responses(key, url, body, etag, last_modified,
+                                                 stored_at, last_access, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (key, url, body, etag, last_modified, now, now, len(body)))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM Responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM Responses ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM Responses WHERE key = ?", evicted)
+
+    def get_json(self, fetcher, url, params=None):
+        """
+        get_json: json body for url, from the cache when fresh or still valid upstream
+            fetcher: Fetcher used for misses and revalidation
+        """
+        key = self.key(url, params)
+        entry = self.lookup(key)
+        if entry is not None and entry[3]:
+            self._count("hits")
+            return json.loads(entry[0])
+
+        response = fetcher.get(url, params, headers=self.conditional_headers(entry))
+        if response.status_code == 304 and entry is not None:
+            self._count("revalidated")
+            self.refresh(key)
+            return json.loads(entry[0])
+
+        self._count("misses")
+        self.store(key, url, response.content,
+                   response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        return response.json()
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def stats(self):
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
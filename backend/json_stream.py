@@ -0,0 +1,80 @@
+import json
+
+""" Stream the records of a large top-level json array in and out without holding the whole file """
+
+CHUNK_SIZE = 1 << 20 # characters read per refill
+
+def iter_json_array(path: str, chunk_size=CHUNK_SIZE):
+    """
+    iter_json_array: yields the elements of the json array stored at path one at a time
+        memory use is bounded by the largest element plus one chunk
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r") as f:
+        buf = f.read(chunk_size)
+        pos = 0
+        started = False
+
+        while True:
+            # skip whitespace and separators, refilling the buffer as needed
+            while True:
+                while pos < len(buf) and (buf[pos].isspace() or (started and buf[pos] == ",")):
+                    pos += 1
+                if pos < len(buf):
+                    break
+                more = f.read(chunk_size)
+                if not more:
+                    raise ValueError(f"{path}: unexpected end of json array")
+                buf, pos = more, 0
+
+            if not started:
+                if buf[pos] != "[":
+                    raise ValueError(f"{path}: expected a json array")
+                started = True
+                pos += 1
+                continue
+
+            if buf[pos] == "]":
+                return
+
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # element is cut off at the end of the buffer
+                more = f.read(chunk_size)
+                if not more:
+                    raise
+                buf, pos = buf[pos:] + more, 0
+                continue
+            # only accept an element once the "," or "]" after it is in the buffer,
+            # a number cut off by the buffer edge ("[1, 2" + "2]") decodes fine but short
+            after = end
+            while after < len(buf) and buf[after].isspace():
+                after += 1
+            if after == len(buf) or buf[after] not in ",]":
+                more = f.read(chunk_size)
+                if more:
+                    buf, pos = buf[pos:] + more, 0
+                    continue
+                if after < len(buf):
+                    raise ValueError(f"{path}: expected , or ] after element")
+
+            yield item
+            pos = end
+            if pos >= chunk_size:
+                buf, pos = buf[pos:], 0
+
+def write_json_array(path: str, items, indent=2) -> int:
+    """
+    write_json_array: writes items to path as one json array, one element at a time
+        returns the number of elements written
+    """
+    count = 0
+    with open(path, "w") as f:
+        f.write("[")
+        for item in items:
+            f.write(",\n" if count else "\n")
+            f.write(json.dumps(item, indent=indent))
+            count += 1
+        f.write("\n]" if count else "]")
+    return count
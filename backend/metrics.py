@@ -0,0 +1,398 @@
+import sys
+import threading
+import time
+from collections import deque
+
+""" Opt-in instrumentation for searches: stage timings, SQL statement counts and slow queries
+
+    Off by default. While off, request() and stage() hand back one shared no-op
+    context manager and connections carry no trace callback, so the cost is a
+    flag check per call. While on, pooled connections come wrapped in a
+    TimedConnection, so a statement is only billed for the time spent inside
+    its execute and fetch calls.
+
+    Usage:
+        metrics.enable(slow_query_ms=50)
+        with metrics.request("search"):
+            with metrics.stage("score"):
+                ...
+        metrics.snapshot()        # dict
+        metrics.prometheus_text() # text exposition format, served at /metrics by server.py
+"""
+
+ENABLED = False
+SLOW_QUERY_MS = 100.0 # statements at least this slow are logged with their query plan
+SLOW_QUERY_LOG = 50 # slow statements kept for snapshot()
+
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+class Histogram():
+    """
+
+    Prometheus style cumulative histogram
+
+    Member Variables:
+        -buckets: upper bounds, +Inf is implied
+        -counts: observations per bucket (not cumulative, summed on export)
+        -sum, count: totals of the observed values
+
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            total += count
+            yield bound, total
+
+class Registry():
+    """
+
+    Process wide metric values
+
+    Member Variables:
+        -counters: (name, labels) --> value
+        -histograms: (name, labels) --> Histogram, labels are sorted (key, value) tuples
+        -slow_queries: most recent slow statements, newest last
+
+    """
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.slow_queries = deque(maxlen=SLOW_QUERY_LOG)
+        self._lock = threading.Lock()
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=(), buckets=LATENCY_BUCKETS):
+        with self._lock:
+            key = (name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def log_slow(self, entry):
+        with self._lock:
+            self.slow_queries.append(entry)
+
+REGISTRY = Registry()
+_local = threading.local()
+
+class _Null():
+    # shared do-nothing context manager handed out while instrumentation is off
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL = _Null()
+
+class RequestStats():
+    """
+
+    What one request did on its thread
+
+    Member Variables:
+        -kind: request name, e.g. "search" or "search_ranked"
+        -stages: stage name --> seconds
+        -statements: SQL statements executed
+        -connections: connections opened
+        -seconds: total time, set when the request ends
+
+    """
+    def __init__(self, kind):
+        self.kind = kind
+        self.stages = {}
+        self.statements = 0
+        self.connections = 0
+        self.seconds = None
+        self._start = time.perf_counter()
+        self._timed = [] # [conn, sql, params, seconds] of every statement run through a TimedCursor
+        self._explaining = False
+
+    def as_dict(self):
+        return {"kind": self.kind, "seconds": self.seconds, "stages": dict(self.stages),
+                "statements": self.statements, "connections": self.connections}
+
+class _Request():
+    def __init__(self, kind):
+        self.kind = kind
+        self.stats = None
+
+    def __enter__(self):
+        if getattr(_local, "request", None) is not None:
+            # nested requests (CourseSearch --> SearchEngine) count once, as the outer one
+            return _local.request
+        self.stats = _local.request = RequestStats(self.kind)
+        return self.stats
+
+    def __exit__(self, *exc):
+        stats = self.stats
+        if stats is None:
+            return False
+        stats.seconds = time.perf_counter() - stats._start
+        _local.request = None
+        _local.last = stats
+
+        labels = (("kind", stats.kind),)
+        REGISTRY.inc("searchengine_requests_total", labels)
+        REGISTRY.observe("searchengine_request_seconds", stats.seconds, labels)
+        REGISTRY.observe("searchengine_request_sql_statements", stats.statements, labels, COUNT_BUCKETS)
+        REGISTRY.observe("searchengine_request_connections", stats.connections, labels, COUNT_BUCKETS)
+        for conn, sql, params, seconds in stats._timed:
+            if seconds * 1000 >= SLOW_QUERY_MS:
+                _log_slow(stats, conn, sql, params, seconds)
+        return False
+
+class _Stage():
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        REGISTRY.observe("searchengine_stage_seconds", seconds, (("stage", self.name),))
+        stats = getattr(_local, "request", None)
+        if stats is not None:
+            stats.stages[self.name] = stats.stages.get(self.name, 0.0) + seconds
+        return False
+
+def request(kind):
+    """
+    request: context manager timing one search request on this thread
+    """
+    if not ENABLED:
+        return _NULL
+    return _Request(kind)
+
+def stage(name):
+    """
+    stage: context manager timing one part of the current request
+    """
+    if not ENABLED:
+        return _NULL
+    return _Stage(name)
+
+def track(kind, fn, *args):
+    """
+    track: fn(*args) as one request, for work handed to a thread pool
+    """
+    with request(kind):
+        return fn(*args)
+
+def current():
+    """
+    current: RequestStats of the request running on this thread, else of the last one it finished
+    """
+    return getattr(_local, "request", None) or getattr(_local, "last", None)
+
+def trace(conn, enabled):
+    """
+    trace: installs or removes the statement counter on a connection (called by connection.py)
+    """
+    if enabled:
+        conn.set_trace_callback(_on_statement)
+    else:
+        conn.set_trace_callback(None)
+
+class TimedCursor():
+    """
+
+    sqlite3 cursor wrapper that times its statement inside SQLite
+
+    Member Variables:
+        -statement: [conn, sql, params, seconds] of the last execute, seconds only
+                    counts time spent in execute and the fetches of its rows, so the
+                    python work between fetches is never billed to the statement
+
+    """
+    def __init__(self, conn, cursor):
+        self._conn = conn
+        self._cursor = cursor
+        self.statement = None
+
+    def _run(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            if self.statement is not None:
+                self.statement[3] += time.perf_counter() - start
+
+    def _start(self, sql, params):
+        self.statement = [self._conn, sql, params, 0.0]
+        stats = getattr(_local, "request", None)
+        if stats is not None and not stats._explaining:
+            stats._timed.append(self.statement)
+
+    def execute(self, sql, params=()):
+        self._start(sql, params)
+        self._run(self._cursor.execute, sql, params)
+        return self
+
+    def executemany(self, sql, rows):
+        # rows are not kept, executemany statements are timed but never explained
+        self._start(sql, None)
+        self._run(self._cursor.executemany, sql, rows)
+        return self
+
+    def fetchone(self):
+        return self._run(self._cursor.fetchone)
+
+    def fetchmany(self, size=None):
+        return self._run(self._cursor.fetchmany, size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._run(self._cursor.fetchall)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self._run(self._cursor.__next__)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class TimedConnection():
+    """
+
+    sqlite3 connection wrapper whose cursors are TimedCursors, handed out by
+    connection.py while instrumentation is on
+
+    Member Variables:
+        -conn: the wrapped sqlite3.Connection, every other attribute comes from it
+
+    """
+    def __init__(self, conn):
+        self.conn = conn
+
+    def cursor(self):
+        return TimedCursor(self.conn, self.conn.cursor())
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, rows):
+        return self.cursor().executemany(sql, rows)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+def connection_opened():
+    if not ENABLED:
+        return
+    REGISTRY.inc("searchengine_connections_opened_total")
+    stats = getattr(_local, "request", None)
+    if stats is not None:
+        stats.connections += 1
+
+def _on_statement(sql):
+    stats = getattr(_local, "request", None)
+    if stats is not None and stats._explaining:
+        return
+    REGISTRY.inc("searchengine_sql_statements_total")
+    if stats is not None:
+        stats.statements += 1
+
+def _log_slow(stats, conn, sql, params, seconds):
+    plan = []
+    if params is not None and sql.lstrip().upper().startswith(("SELECT", "WITH")):
+        stats._explaining = True
+        _local.request = stats
+        try:
+            plan = [row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params)]
+        except Exception as e:
+            plan = [f"(no plan: {e})"]
+        finally:
+            stats._explaining = False
+            _local.request = None
+    entry = {"kind": stats.kind, "ms": round(seconds * 1000, 3), "sql": " ".join(sql.split()), "plan": plan}
+    REGISTRY.inc("searchengine_slow_queries_total")
+    REGISTRY.log_slow(entry)
+    print(f"Slow query ({entry['ms']} ms, {stats.kind}): {entry['sql'][:500]}", file=sys.stderr)
+    for line in plan:
+        print("    " + line, file=sys.stderr)
+
+def enable(slow_query_ms=SLOW_QUERY_MS):
+    """
+    enable: turns instrumentation on, pooled connections pick up tracing on their next use
+    """
+    global ENABLED, SLOW_QUERY_MS
+    SLOW_QUERY_MS = slow_query_ms
+    ENABLED = True
+
+def disable():
+    global ENABLED
+    ENABLED = False
+
+def reset():
+    global REGISTRY
+    REGISTRY = Registry()
+
+def snapshot() -> dict:
+    """
+    snapshot: current metric values as plain data
+    """
+    registry = REGISTRY
+    with registry._lock:
+        return {
+            "enabled": ENABLED,
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in sorted(registry.counters.items())],
+            "histograms": [{"name": name, "labels": dict(labels), "count": h.count, "sum": h.sum,
+                            "buckets": {str(bound): count for bound, count in h.cumulative()}}
+                           for (name, labels), h in sorted(registry.histograms.items())],
+            "slow_queries": list(registry.slow_queries)
+        }
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+def prometheus_text() -> str:
+    """
+    prometheus_text: metrics in the Prometheus text exposition format (version 0.0.4)
+    """
+    registry = REGISTRY
+    lines = []
+    typed = set()
+    with registry._lock:
+        for (name, labels), value in sorted(registry.counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_labels(labels)} {value}")
+        for (name, labels), histogram in sorted(registry.histograms.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, count in histogram.cumulative():
+                lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+    return "\n".join(lines) + "\n"
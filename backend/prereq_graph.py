@@ -0,0 +1,226 @@
+from array import array
+from collections import deque
+
+from catalog import iter_bits, to_bits
+
+""" Prerequisite graph over a Catalog, every answer comes from structures built once per load
+
+    Edges run from a course to the courses it requires. All prerequisites of a
+    course are required (the Prerequisites table has no "one of" groups).
+"""
+
+class PrereqGraph():
+    """
+
+    Precomputed prerequisite graph
+
+    Member Variables:
+        -catalog: Catalog the graph was built from, dense ids are shared with it
+        -required_offsets, required_by: reverse CSR of catalog.prereq_targets,
+                course i is a direct prerequisite of required_by[required_offsets[i]:required_offsets[i + 1]]
+        -order: dense ids in topological order, prerequisites before the courses needing them
+        -levels: dense id --> quarters of prerequisites below it (0 = no prerequisites)
+        -ancestors: dense id --> bitset of every course it transitively requires
+        -descendants: dense id --> bitset of every course that transitively requires it
+        -cycles: lists of course ids that require each other, normally empty
+
+    Courses on a cycle can never be unlocked by completing the rest of the
+    catalog. They share a level, and every member has the whole cycle as
+    ancestors and descendants.
+
+    """
+    def __init__(self, catalog):
+        self.catalog = catalog
+        n = len(catalog.ids)
+        self.required_offsets, self.required_by = _reverse(catalog.prereq_offsets, catalog.prereq_targets, n)
+        self.order = []
+        self.levels = array("i", [0]) * n
+        self.ancestors = [0] * n
+        self.descendants = [0] * n
+        self.cycles = []
+
+        components = _components(catalog.prereq_offsets, catalog.prereq_targets, n)
+        offsets, targets = catalog.prereq_offsets, catalog.prereq_targets
+        cyclic = [len(c) > 1 or c[0] in self._direct(c[0]) for c in components]
+        # components come out prerequisites first, so ancestors only look backwards
+        for component, is_cycle in zip(components, cyclic):
+            members = set(component)
+            level = 0
+            reach = to_bits(component) if is_cycle else 0
+            for i in component:
+                for j in range(offsets[i], offsets[i + 1]):
+                    p = targets[j]
+                    if p not in members:
+                        level = max(level, self.levels[p] + 1)
+                        reach |= self.ancestors[p] | (1 << p)
+            for i in component:
+                self.levels[i] = level
+                self.ancestors[i] = reach
+            self.order.extend(component)
+            if is_cycle:
+                self.cycles.append(sorted(catalog.ids[i] for i in component))
+
+        # and descendants only look forwards
+        for component, is_cycle in zip(reversed(components), reversed(cyclic)):
+            members = set(component)
+            reach = to_bits(component) if is_cycle else 0
+            for i in component:
+                for j in range(self.required_offsets[i], self.required_offsets[i + 1]):
+                    d = self.required_by[j]
+                    if d not in members:
+                        reach |= self.descendants[d] | (1 << d)
+            for i in component:
+                self.descendants[i] = reach
+
+    def _direct(self, dense):
+        offsets = self.catalog.prereq_offsets
+        return self.catalog.prereq_targets[offsets[dense]:offsets[dense + 1]]
+
+    def _dense(self, course_id):
+        dense = self.catalog.index.get(course_id)
+        if dense is None:
+            raise KeyError(f"unknown course {course_id!r}")
+        return dense
+
+    def _ordered(self, bits) -> list:
+        # course ids by level, then by id
+        ids = self.catalog.ids
+        return [ids[i] for i in sorted(iter_bits(bits), key=lambda i: (self.levels[i], ids[i]))]
+
+    def level(self, course_id) -> int:
+        return self.levels[self._dense(course_id)]
+
+    def prerequisites(self, course_id) -> list:
+        """
+        prerequisites: the full prerequisite chain of course_id, deepest prerequisites first
+        """
+        return self._ordered(self.ancestors[self._dense(course_id)])
+
+    def dependents(self, course_id) -> list:
+        """
+        dependents: every course that needs course_id somewhere in its chain
+        """
+        return self._ordered(self.descendants[self._dense(course_id)])
+
+    def requires(self, course_id, prereq_id) -> bool:
+        return bool(self.ancestors[self._dense(course_id)] >> self._dense(prereq_id) & 1)
+
+    def unlocks(self, course_id, completed=()) -> list:
+        """
+        unlocks: courses whose last missing prerequisite is course_id
+            completed: course ids already taken, course_id is added to them
+        """
+        catalog = self.catalog
+        dense = self._dense(course_id)
+        done = {catalog.index[cid] for cid in completed if cid in catalog.index}
+        done.add(dense)
+        offsets, targets = catalog.prereq_offsets, catalog.prereq_targets
+        unlocked = []
+        for j in range(self.required_offsets[dense], self.required_offsets[dense + 1]):
+            d = self.required_by[j]
+            if d not in done and all(targets[k] in done for k in range(offsets[d], offsets[d + 1])):
+                unlocked.append(d)
+        return self._ordered(to_bits(unlocked))
+
+    def remaining(self, target_id, completed=()) -> list:
+        """
+        remaining: prerequisites of target_id not yet in completed, in an order they can be taken
+        """
+        bits = self.ancestors[self._dense(target_id)] & ~self.catalog.bits(completed)
+        return self._ordered(bits)
+
+    def shortest_path(self, start_id, target_id):
+        """
+        shortest_path: fewest-step chain start_id --> ... --> target_id where each course
+            is a direct prerequisite of the next, None when target_id doesn't need start_id
+        """
+        start, target = self._dense(start_id), self._dense(target_id)
+        if start == target:
+            return [start_id]
+        if not self.descendants[start] >> target & 1:
+            return None
+
+        # breadth first over dependents, only through courses that still lead to target
+        toward = self.ancestors[target]
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            for j in range(self.required_offsets[i], self.required_offsets[i + 1]):
+                d = self.required_by[j]
+                if d in previous or not (d == target or toward >> d & 1):
+                    continue
+                previous[d] = i
+                if d == target:
+                    path = []
+                    while d is not None:
+                        path.append(self.catalog.ids[d])
+                        d = previous[d]
+                    return path[::-1]
+                queue.append(d)
+        return None
+
+def _reverse(offsets, targets, n):
+    # CSR of the reversed edges, built with a counting pass
+    counts = array("I", [0]) * (n + 1)
+    for t in targets:
+        counts[t + 1] += 1
+    for i in range(n):
+        counts[i + 1] += counts[i]
+    reverse_offsets = array("I", counts)
+    fill = array("I", counts)
+    reverse = array("I", [0]) * len(targets)
+    for i in range(n):
+        for j in range(offsets[i], offsets[i + 1]):
+            t = targets[j]
+            reverse[fill[t]] = i
+            fill[t] += 1
+    return reverse_offsets, reverse
+
+def _components(offsets, targets, n) -> list:
+    """
+    _components: strongly connected components (iterative Tarjan), each one listed
+        after every component it can reach, i.e. prerequisites first
+    """
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    components = []
+    counter = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, offsets[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            node, edge = work[-1]
+            if edge < offsets[node + 1]:
+                work[-1] = (node, edge + 1)
+                child = targets[edge]
+                if index[child] == -1:
+                    index[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack[child] = True
+                    work.append((child, offsets[child]))
+                elif on_stack[child]:
+                    low[node] = min(low[node], index[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
@@ -0,0 +1,92 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from connection import get_connection
+
+""" Result cache for CourseSearch, invalidated when the database is reloaded """
+
+MAX_ENTRIES = 4096
+TTL = 10 * 60 # seconds
+
+def db_version(db_path) -> tuple:
+    """
+    db_version: identifies the current contents of the database, compared for equality only
+        the load counter in the header (PRAGMA user_version, bumped by create_index and
+        update_index) together with the identity and last write of the file and its WAL,
+        so writes that do not bump the counter, and a file deleted and rebuilt from
+        version 1, still drop cached results and snapshots
+    """
+    version = get_connection(db_path).execute("PRAGMA user_version").fetchone()[0]
+    if db_path == ":memory:":
+        return (version,)
+    return (version, *_file_stamp(db_path), *_file_stamp(db_path + "-wal"))
+
+def _file_stamp(path) -> tuple:
+    # (inode, mtime, size), or Nones for a missing file
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return (None, None, None)
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+def bump_db_version(conn):
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.execute(f"PRAGMA user_version = {version + 1}")
+
+class QueryCache():
+    """
+
+    LRU cache with a TTL for search results
+
+    Member Variables:
+        -max_entries: entries kept before the least recently used is evicted
+        -ttl: seconds an entry is served
+        -hits, misses, evictions: counters since the cache was created
+
+    Entries remember the db_version they were computed against and count as a
+    miss once the database has been reloaded.
+
+    """
+    def __init__(self, max_entries=MAX_ENTRIES, ttl=TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version or entry[1] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, version, value):
+        with self._lock:
+            self._entries[key] = (version, time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "entries": len(self._entries)}
+
+# shared by every CourseSearch unless one is given its own
+RESULT_CACHE = QueryCache()
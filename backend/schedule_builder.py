@@ -0,0 +1,205 @@
+import heapq
+import json
+import re
+from dataclasses import dataclass
+
+from connection import get_connection
+from sections import TIME_RANGES
+
+""" Conflict-free schedules for a set of courses in one term
+
+    Every section's weekly meetings are turned into a bitmask over the minutes of
+    the week (bit d * 1440 + m = minute m of day d), so the conflict check for a
+    section against everything already chosen is a single AND.
+"""
+
+TOP_N = 10 # schedules returned
+MAX_NODES = 200000 # search steps before giving up on finding better schedules
+MINUTES_PER_DAY = 24 * 60
+DAY_MASK = (1 << MINUTES_PER_DAY) - 1
+
+DAY_PATTERN = re.compile(r"Su|Sa|Tu|Th|M|W|F")
+DAYS = {"M": 0, "Tu": 1, "W": 2, "Th": 3, "F": 4, "Sa": 5, "Su": 6}
+
+# ranking penalties, lower total is better
+W_GAP = 1.0 # per idle minute between classes on the same day
+W_DAY = 60.0 # per day with at least one class
+W_OFF_PREFERENCE = 0.5 # per minute of class outside the preferred part of the day
+
+@dataclass(frozen=True)
+class Section():
+    """
+
+    One section with all of its meetings
+
+    Member Variables:
+        -course_id, course_code, section_type: identify the section (course_code is the websoc code)
+        -meetings: (days, start_time, end_time, building_id, building_number) per Terms row
+        -intervals: (start, end) minutes of the week, one per meeting day
+        -mask: bitmask of the minutes in intervals, 0 for TBA sections
+
+    """
+    course_id: str
+    course_code: int
+    section_type: str
+    meetings: tuple
+    intervals: tuple
+    mask: int
+
+def parse_days(days) -> list:
+    # "TuTh" --> [1, 3]
+    return [DAYS[day] for day in DAY_PATTERN.findall(days or "")]
+
+def week_intervals(days, start, end) -> list:
+    if start is None or end is None or end <= start:
+        return []
+    return [(day * MINUTES_PER_DAY + start, day * MINUTES_PER_DAY + end) for day in parse_days(days)]
+
+def interval_mask(intervals) -> int:
+    mask = 0
+    for start, end in intervals:
+        mask |= ((1 << (end - start)) - 1) << start
+    return mask
+
+def load_sections(course_ids, year, quarter, db_path) -> dict:
+    """
+    load_sections: sections of the courses in one term
+        returns {(course_id, section_type): [Section]}, one group per component a student enrolls in
+    """
+    rows = get_connection(db_path).execute('''
+        SELECT course_id, course_code, section_type, days, start_time, end_time, building_id, building_number
+        FROM Terms
+        WHERE course_id IN (SELECT value FROM json_each(?)) AND year = ? AND quarter = ?
+        ORDER BY course_id, course_code, meeting
+    ''', (json.dumps(list(course_ids)), year, quarter.lower())).fetchall()
+
+    meetings = {}
+    for cid, code, section_type, days, start, end, building, room in rows:
+        meetings.setdefault((cid, code, section_type or ""), []).append((days, start, end, building, room))
+
+    groups = {}
+    for (cid, code, section_type), section_meetings in meetings.items():
+        intervals = []
+        for days, start, end, _, _ in section_meetings:
+            intervals.extend(week_intervals(days, start, end))
+        intervals.sort()
+        groups.setdefault((cid, section_type), []).append(
+            Section(cid, code, section_type, tuple(section_meetings), tuple(intervals), interval_mask(intervals)))
+    return groups
+
+def off_preference(intervals, prefer=None) -> int:
+    # minutes of class outside the preferred part of the day
+    if not prefer:
+        return 0
+    low, high = TIME_RANGES[prefer]
+    off = 0
+    for start, end in intervals:
+        day = start // MINUTES_PER_DAY * MINUTES_PER_DAY
+        start, end = start - day, end - day
+        off += (end - start) - max(0, min(end, high) - max(start, low))
+    return off
+
+def day_bits(intervals) -> int:
+    bits = 0
+    for start, _ in intervals:
+        bits |= 1 << (start // MINUTES_PER_DAY)
+    return bits
+
+def mask_cost(mask) -> tuple:
+    # (idle minutes, days on campus) of a conflict-free week mask, idle = span - busy per day
+    gaps = 0
+    days = 0
+    for day in range(7):
+        minutes = (mask >> (day * MINUTES_PER_DAY)) & DAY_MASK
+        if minutes:
+            days += 1
+            span = minutes.bit_length() - (minutes & -minutes).bit_length() + 1
+            gaps += span - bin(minutes).count("1")
+    return gaps, days
+
+def schedule_cost(sections, prefer=None) -> tuple:
+    """
+    schedule_cost: (cost, idle minutes, days on campus) for a conflict-free schedule, lower cost is better
+        prefer: "morning", "afternoon" or "evening", minutes outside it are penalized
+    """
+    mask = 0
+    off = 0
+    for section in sections:
+        mask |= section.mask
+        off += off_preference(section.intervals, prefer)
+    gaps, days = mask_cost(mask)
+    return W_GAP * gaps + W_DAY * days + W_OFF_PREFERENCE * off, gaps, days
+
+def build_schedules(course_ids, year, quarter, db_path, limit=TOP_N, prefer=None, max_nodes=MAX_NODES) -> dict:
+    """
+    build_schedules: best conflict-free schedules taking one section of every component
+        (lecture, discussion, lab, ...) of every course
+        returns {"schedules": [...], "missing": course ids without sections in the term,
+                 "explored": search steps used, "complete": False if max_nodes cut the search short}
+
+    Components with the fewest sections are placed first, and a branch is dropped
+    as soon as some unplaced component has no section left that fits. Days on
+    campus and minutes outside the preference only grow as sections are added,
+    so once limit schedules are found any branch already costing more than the
+    worst of them is cut too.
+    """
+    if prefer and prefer not in TIME_RANGES:
+        raise ValueError(f"unknown time preference {prefer!r}")
+    groups = load_sections(course_ids, year, quarter, db_path)
+    missing = sorted(set(course_ids) - {cid for cid, _ in groups})
+    # (section, days it meets, off-preference penalty) per option
+    order = [[(section, day_bits(section.intervals), W_OFF_PREFERENCE * off_preference(section.intervals, prefer))
+              for section in group] for group in sorted(groups.values(), key=len)]
+
+    best = [] # heap of (-cost, tiebreak, sections), worst schedule on top
+    explored = 0
+    truncated = False # set once max_nodes cuts a branch off
+    chosen = []
+
+    def place(depth, occupied, days, off):
+        nonlocal explored, truncated
+        if explored >= max_nodes:
+            truncated = True
+            return
+        explored += 1
+        if len(best) == limit and W_DAY * bin(days).count("1") + off >= -best[0][0]:
+            return
+        if depth == len(order):
+            gaps, day_count = mask_cost(occupied)
+            cost = W_GAP * gaps + W_DAY * day_count + off
+            entry = (-cost, explored, tuple(chosen))
+            if len(best) < limit:
+                heapq.heappush(best, entry)
+            elif -cost > best[0][0]:
+                heapq.heapreplace(best, entry)
+            return
+        for section, section_days, section_off in order[depth]:
+            if section.mask & occupied:
+                continue
+            now = occupied | section.mask
+            # forward check, every later component still needs a section that fits
+            if all(any(not later.mask & now for later, _, _ in group) for group in order[depth + 1:]):
+                chosen.append(section)
+                place(depth + 1, now, days | section_days, off + section_off)
+                chosen.pop()
+
+    if order:
+        place(0, 0, 0, 0.0)
+
+    schedules = []
+    for _, _, sections in sorted(best, key=lambda entry: (-entry[0], entry[1])):
+        cost, gaps, days = schedule_cost(sections, prefer)
+        schedules.append({
+            "cost": cost,
+            "gaps": gaps,
+            "days": days,
+            "sections": [{
+                "courseId": s.course_id,
+                "sectionCode": s.course_code,
+                "sectionType": s.section_type,
+                "meetings": [{"days": meeting_days, "start": start, "end": end, "building": building, "room": room}
+                             for meeting_days, start, end, building, room in s.meetings]
+            } for s in sections]
+        })
+    return {"schedules": schedules, "missing": missing, "explored": explored,
+            "complete": not truncated}
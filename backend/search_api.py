@@ -0,0 +1,420 @@
+import json
+import re
+
+import sql_index
+from autocomplete import MAX_SUGGESTIONS
+from catalog import course_level
+from connection import get_connection
+from coverage import PLANS, MAX_COURSES
+from schedule_builder import build_schedules, TOP_N
+from sections import TIME_RANGES
+
+""" Query logic behind /api/search (see server.py), shaped for SearchPage.js """
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_TEXT_HITS = 1000 # keyword matches considered before filters and paging
+MAX_PLANS = 10 # coverage plans one request may ask for
+MAX_PLAN_COURSES = 8 # most courses in one coverage plan
+SUGGESTIONS = 8 # typeahead suggestions unless the request asks for more
+
+# SearchPage.js GE values --> GenEdRequirements.ge_id
+GE_FILTERS = {
+    "Ia": "1A", "Ib": "1B", "II": "2", "III": "3", "IV": "4",
+    "Va": "5A", "Vb": "5B", "VI": "6", "VII": "7", "VIII": "8"
+}
+GE_LABELS = {ge_id: label for label, ge_id in GE_FILTERS.items()}
+
+SORT_KEYS = {
+    "relevance": lambda c: (-c["textScore"], -c["matchScore"]),
+    "match": lambda c: -c["matchScore"],
+    "units-asc": lambda c: c["units"],
+    "units-desc": lambda c: -c["units"],
+    "dept": lambda c: c["dept"]
+}
+
+MAX_SCORE = sql_index.W_MAJOR + sql_index.W_MINOR + sql_index.W_NO_PREREQ
+
+def parse_quarter(value):
+    # "2026-Spring" --> (2026, "spring")
+    if not value or "-" not in value:
+        return None, None
+    year, quarter = value.split("-", 1)
+    return (int(year) if year.isdigit() else None), quarter.lower()
+
+def split_list(value):
+    if isinstance(value, list):
+        return [v.strip() for v in value if v and v.strip()]
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+def resolve_programs(names, table, id_column, name_column, db_path):
+    """
+    resolve_programs: profile major/minor text --> program ids
+        an exact id or name (any case) wins, only text matching neither is looked up
+        as the start of a word in the names ("Computer" finds "Computer Science",
+        "CS" does not find "Physics")
+    """
+    conn = get_connection(db_path)
+    ids = set()
+    for name in names:
+        rows = conn.execute(f'''
+            SELECT {id_column} FROM {table}
+            WHERE {id_column} = ? OR {name_column} = ? COLLATE NOCASE
+        ''', (name, name)).fetchall()
+        if not rows:
+            # % and _ typed by the student are matched literally
+            pattern = re.sub(r"([\\%_])", r"\\\1", name)
+            rows = conn.execute(f'''
+                SELECT {id_column} FROM {table}
+                WHERE {name_column} LIKE ? || '%' ESCAPE '\\' OR {name_column} LIKE '% ' || ? || '%' ESCAPE '\\'
+            ''', (pattern, pattern)).fetchall()
+        ids.update(row[0] for row in rows)
+    return ids
+
+def int_param(params, name, default, low, high=None) -> int:
+    # query string integer clamped to [low, high], a curated 400 instead of int()'s message
+    value = params.get(name)
+    if value in (None, ""):
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{name} must be an integer")
+    value = max(value, low)
+    return min(value, high) if high is not None else value
+
+def normalize_course_id(code, db_path=sql_index.DB_PATH):
+    # "ICS 31" / "I&C SCI 31" --> "I&CSCI31", resolved against Courses with the same department
+    # aliases as the search box suggestions, codes matching no course just lose their spaces
+    course_id = sql_index.get_engine(db_path).completion_index().course_id(code)
+    return course_id or re.sub(r"\s+", "", code).upper()
+
+def format_minutes(minutes):
+    hour, minute = divmod(minutes, 60)
+    suffix = "am" if hour < 12 else "pm"
+    return f"{(hour - 1) % 12 + 1}:{minute:02d}{suffix}"
+
+def build_search(profile, db_path):
+    """
+    build_search: CourseSearch for the student profile saved by UserProfilePage.js
+    """
+    search = sql_index.CourseSearch(db_path)
+    profile = profile or {}
+    for major_id in resolve_programs(split_list(profile.get("major")), "Majors", "major_id", "major_name", db_path):
+        search.add_major(major_id)
+    for minor_id in resolve_programs(split_list(profile.get("minor")), "Minors", "minor_id", "minor_name", db_path):
+        search.add_minor(minor_id)
+    for spec_id in resolve_programs(split_list(profile.get("specialization")), "Specializations",
+                                    "specialization_id", "specialization_name", db_path):
+        search.add_specialization(spec_id)
+    for code in split_list(profile.get("completedCourses")):
+        search.add_prerequisite(normalize_course_id(code, db_path))
+    return search
+
+def _filter_courses(course_ids, params, db_path, catalog=None):
+    ge_id = GE_FILTERS.get(params.get("ge"))
+    max_units = params.get("maxUnits")
+    max_units = int(max_units) if max_units and str(max_units).isdigit() else None
+    # the slider tops out at 8, which means no limit
+    if max_units is not None and max_units >= 8:
+        max_units = None
+
+    if catalog is not None:
+        return catalog.rows(catalog.bits(course_ids), params.get("dept") or None,
+                            ge_id, params.get("level") or None, max_units)
+
+    rows = get_connection(db_path).execute('''
+        SELECT c.course_id, c.department, c.course_number, c.course_title, c.min_units, c.max_units
+        FROM Courses c
+        WHERE c.course_id IN (SELECT value FROM json_each(:ids))
+          AND (:dept IS NULL OR c.department = :dept)
+          AND (:max_units IS NULL OR c.min_units <= :max_units)
+          AND (:ge IS NULL OR EXISTS (
+                SELECT 1 FROM GenEdRequirements g
+                WHERE g.course_id = c.course_id AND g.ge_id = :ge))
+    ''', {
+        "ids": json.dumps(list(course_ids)),
+        "dept": params.get("dept") or None,
+        "max_units": max_units,
+        "ge": ge_id
+    }).fetchall()
+
+    level = params.get("level")
+    if level:
+        rows = [row for row in rows if course_level(row[2]) == level]
+    return rows
+
+def _course_details(course_ids, year, quarter, params, db_path):
+    """
+    _course_details: GE ids and one meeting in the term for each course,
+        preferring a meeting that matches the time and format filters
+    """
+    start_min, end_min = TIME_RANGES.get(params.get("time"), (0, 24 * 60))
+    conn = get_connection(db_path)
+    ids = json.dumps(list(course_ids))
+    ge = {}
+    for cid, ge_id in conn.execute('''
+        SELECT course_id, ge_id FROM GenEdRequirements
+        WHERE course_id IN (SELECT value FROM json_each(?))
+    ''', (ids,)):
+        ge.setdefault(cid, []).append(GE_LABELS.get(ge_id, ge_id))
+
+    meetings = {}
+    for cid, fmt, building, room, start, end, days in conn.execute('''
+        SELECT course_id, format, building_id, building_number, start_time, end_time, days
+        FROM Terms
+        WHERE course_id IN (SELECT value FROM json_each(:ids))
+          AND (:year IS NULL OR year = :year) AND (:quarter IS NULL OR quarter = :quarter)
+          AND start_time IS NOT NULL
+        ORDER BY (start_time >= :start_min AND start_time < :end_min
+                  AND (:format IS NULL OR format = :format)) DESC,
+                 course_code, meeting
+    ''', {"ids": ids, "year": year, "quarter": quarter, "start_min": start_min,
+          "end_min": end_min, "format": params.get("format") or None}):
+        if cid not in meetings:
+            meetings[cid] = {
+                "time": f"{days} {format_minutes(start)}-{format_minutes(end)}" if end else days,
+                "location": f"{building} {room}".strip() if building else "TBA",
+                "format": fmt or ""
+            }
+    return ge, meetings
+
+def run_search(params: dict, profile: dict, db_path=sql_index.DB_PATH) -> dict:
+    """
+    run_search: answers one /api/search request
+        params: query string values (q, quarter, dept, level, ge, time, format, maxUnits,
+                sortBy, page, pageSize)
+        profile: student profile from the request body, may be None
+        returns {"courses": [...], "total": n, "page": p, "pageSize": s}
+    """
+    if params.get("time") and params["time"] not in TIME_RANGES:
+        raise ValueError(f"unknown time filter {params['time']!r}")
+    search = build_search(profile, db_path)
+    year, quarter = parse_quarter(params.get("quarter"))
+    candidates = search.search(year, quarter,
+                               params.get("time") or None, params.get("format") or None)
+
+    text_scores = {}
+    query = (params.get("q") or "").strip()
+    if query:
+        # BM25, falling back to typo tolerant matching when a word matches no course as typed
+        text_scores = {hit["course_id"]: hit["score"] for hit in search.search_text(query, MAX_TEXT_HITS)}
+        candidates = candidates & text_scores.keys()
+
+    rows = _filter_courses(candidates, params, db_path, search.engine.catalog())
+    scores = search.engine.score([row[0] for row in rows], search.query())
+
+    courses = [_course_card(row, scores[row[0]], text_scores.get(row[0], 0.0)) for row in rows]
+
+    sort_by = params.get("sortBy", "relevance")
+    courses.sort(key=SORT_KEYS.get(sort_by, SORT_KEYS["relevance"]))
+
+    page_size = int_param(params, "pageSize", PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    page = int_param(params, "page", 1, 1)
+    page_courses = courses[(page - 1) * page_size:page * page_size]
+    _add_details(page_courses, year, quarter, params, db_path)
+
+    return {"courses": page_courses, "total": len(courses), "page": page, "pageSize": page_size}
+
+def _course_card(row, score, text_score=0.0) -> dict:
+    # one Courses row and its (score, reasons) --> the course dict SearchPage.js renders
+    cid, dept, number, title, min_units, max_units = row
+    score, reasons = score
+    return {
+        "id": cid,
+        "code": f"{dept} {number}",
+        "title": title,
+        "dept": dept,
+        "level": course_level(number),
+        "units": max_units,
+        "matchScore": round(100 * score / MAX_SCORE),
+        "textScore": text_score,
+        "reasons": reasons,
+        "explanation": ". ".join(reasons)
+    }
+
+def _add_details(courses, year, quarter, params, db_path):
+    # meeting, GE and tags for the course dicts about to be sent
+    ge, meetings = _course_details([c["id"] for c in courses], year, quarter, params, db_path)
+    for course in courses:
+        meeting = meetings.get(course["id"], {"time": "TBA", "location": "TBA", "format": ""})
+        course.update(meeting)
+        course["instructor"] = ""
+        course["ge"] = ge.get(course["id"], [])
+        tags = []
+        if "Required for your major" in course["reasons"]:
+            tags.append("major")
+        if course["ge"]:
+            tags.append("ge")
+        if "No prerequisites" not in course["reasons"]:
+            tags.append("prereq")
+        course["tags"] = tags
+
+def run_prereqs(params: dict, profile: dict, db_path=sql_index.DB_PATH) -> dict:
+    """
+    run_prereqs: answers one /api/prereqs request
+        params: course (required), target (optional, adds the shortest prerequisite path to it)
+        profile: student profile, its completed courses narrow "remaining" and "unlocks"
+        returns the course's level, full chain, remaining chain, what taking it unlocks
+        and every course that depends on it
+    """
+    course = normalize_course_id(params.get("course") or "", db_path)
+    if not course:
+        raise ValueError("missing course")
+    graph = sql_index.get_engine(db_path).prereq_graph()
+    completed = [normalize_course_id(code, db_path) for code in split_list((profile or {}).get("completedCourses"))]
+    try:
+        result = {
+            "course": course,
+            "level": graph.level(course),
+            "prerequisites": graph.prerequisites(course),
+            "remaining": graph.remaining(course, completed),
+            "unlocks": graph.unlocks(course, completed),
+            "dependents": graph.dependents(course)
+        }
+        if params.get("target"):
+            result["path"] = graph.shortest_path(course, normalize_course_id(params["target"], db_path))
+    except KeyError as e:
+        raise ValueError(e.args[0])
+    return result
+
+def run_plan(params: dict, profile: dict, db_path=sql_index.DB_PATH) -> dict:
+    """
+    run_plan: answers one /api/plan request
+        params: quarter (first term, e.g. "2026-Fall"), quarters, maxUnits, summer ("1" to plan summers)
+        profile: student profile, its majors, minors and completed courses drive the plan
+        returns degree_planner.plan_degree's {"terms": [...], "unplaced": [...]}
+    """
+    search = build_search(profile, db_path)
+    if not search.majors and not search.minors:
+        raise ValueError("profile has no major or minor to plan for")
+    year, quarter = parse_quarter(params.get("quarter"))
+    quarters = int(params.get("quarters") or sql_index.MAX_QUARTERS)
+    max_units = int(params.get("maxUnits") or sql_index.MAX_UNITS)
+    return search.plan(year, quarter, quarters, max_units, params.get("summer") == "1")
+
+def run_schedule(params: dict, profile: dict, db_path=sql_index.DB_PATH) -> dict:
+    """
+    run_schedule: answers one /api/schedule request
+        params: quarter (e.g. "2026-Spring"), courses (comma separated codes),
+                prefer (morning/afternoon/evening), limit
+        returns schedule_builder.build_schedules' result
+    """
+    year, quarter = parse_quarter(params.get("quarter"))
+    if not year or not quarter:
+        raise ValueError("quarter is required, e.g. 2026-Spring")
+    courses = [normalize_course_id(code, db_path) for code in split_list(params.get("courses"))]
+    if not courses:
+        raise ValueError("no courses to schedule")
+    limit = min(max(int(params.get("limit") or TOP_N), 1), MAX_PAGE_SIZE)
+    return build_schedules(courses, year, quarter, db_path, limit, params.get("prefer") or None)
+
+def run_coverage(params: dict, profile: dict, db_path=sql_index.DB_PATH) -> dict:
+    """
+    run_coverage: answers one /api/coverage request
+        params: quarter, time, format (feasibility filters), ge (comma separated SearchPage.js GE values,
+                defaults to the profile's geNeeded), plans, maxCourses
+        profile: student profile, its completed courses and specializations count too
+        returns {"plans": [...], "coverable", "uncoverable", "satisfied", "exact"} with GE categories
+        as SearchPage.js values, and "courses": course dicts for the best plan, shaped like /api/search's
+    """
+    if params.get("time") and params["time"] not in TIME_RANGES:
+        raise ValueError(f"unknown time filter {params['time']!r}")
+    labels = split_list(params.get("ge")) or split_list((profile or {}).get("geNeeded"))
+    unknown = [label for label in labels if label not in GE_FILTERS]
+    if unknown:
+        raise ValueError(f"unknown GE categories {unknown}")
+    search = build_search(profile, db_path)
+    if not labels and not search.specializations:
+        raise ValueError("no GE categories or specializations to cover")
+
+    year, quarter = parse_quarter(params.get("quarter"))
+    query = search.query(year, quarter, params.get("time") or None, params.get("format") or None)
+    limit = min(max(int(params.get("plans") or PLANS), 1), MAX_PLANS)
+    max_courses = min(max(int(params.get("maxCourses") or MAX_COURSES), 1), MAX_PLAN_COURSES)
+    result = search.engine.cover(query, [GE_FILTERS[label] for label in labels], limit, max_courses)
+
+    def display(names):
+        return [f"GE {GE_LABELS[name]}" if name in GE_LABELS else name for name in names]
+
+    for key in ("coverable", "uncoverable", "satisfied"):
+        result[key] = display(result[key])
+    for plan in result["plans"]:
+        plan["covers"] = display(plan["covers"])
+        for pick in plan["courses"]:
+            pick["covers"] = display(pick["covers"])
+
+    # the best plan as search results, so SearchPage.js can render it with the same cards
+    courses = []
+    if result["plans"]:
+        picks = result["plans"][0]["courses"]
+        rows = {row[0]: row for row in _filter_courses([pick["id"] for pick in picks], {}, db_path,
+                                                       search.engine.catalog())}
+        scores = search.engine.score(list(rows), query)
+        for pick in picks:
+            if pick["id"] in rows:
+                score, reasons = scores[pick["id"]]
+                reasons = ["Covers " + ", ".join(pick["covers"])] + reasons
+                courses.append(_course_card(rows[pick["id"]], (score, reasons)))
+        _add_details(courses, year, quarter, params, db_path)
+    result["courses"] = courses
+    return result
+
+def run_suggest(params: dict, profile: dict, db_path=sql_index.DB_PATH) -> dict:
+    """
+    run_suggest: answers one /api/suggest request
+        params: q (text typed so far), limit
+        returns {"suggestions": [{"id", "dept", "code", "title"}]}, most popular first
+    """
+    limit = min(max(int(params.get("limit") or SUGGESTIONS), 1), MAX_SUGGESTIONS)
+    text = (params.get("q") or "").strip()
+    if not text:
+        return {"suggestions": []}
+    return {"suggestions": sql_index.get_engine(db_path).complete(text, limit)}
+
+def run_batch(params: dict, body: dict, db_path=sql_index.DB_PATH):
+    """
+    run_batch: answers one /api/batch request
+        params: quarter, time, format applied to every profile
+        body: {"profiles": [profile, ...]}, a profile may carry an "id" that is echoed back
+        returns a generator of {"index", "id", "courses"} dicts, one per profile in order
+    """
+    profiles = body.get("profiles") if isinstance(body, dict) else None
+    if not isinstance(profiles, list):
+        raise ValueError("body needs a profiles list")
+    for position, profile in enumerate(profiles):
+        if not isinstance(profile, dict):
+            raise ValueError(f"profile {position} must be an object")
+    if params.get("time") and params["time"] not in TIME_RANGES:
+        raise ValueError(f"unknown time filter {params['time']!r}")
+    year, quarter = parse_quarter(params.get("quarter"))
+    time_of_day, course_format = params.get("time") or None, params.get("format") or None
+    engine = sql_index.get_engine(db_path)
+
+    # many students share programs, resolve each name once
+    resolved = {}
+    def programs(names, table, id_column, name_column):
+        ids = set()
+        for name in names:
+            key = (table, name)
+            if key not in resolved:
+                resolved[key] = resolve_programs([name], table, id_column, name_column, db_path)
+            ids |= resolved[key]
+        return ids
+
+    def queries():
+        for profile in profiles:
+            yield sql_index.CourseQuery(
+                majors=programs(split_list(profile.get("major")), "Majors", "major_id", "major_name"),
+                minors=programs(split_list(profile.get("minor")), "Minors", "minor_id", "minor_name"),
+                specializations=programs(split_list(profile.get("specialization")), "Specializations",
+                                         "specialization_id", "specialization_name"),
+                completed=[normalize_course_id(code, db_path) for code in split_list(profile.get("completedCourses"))],
+                year=year, quarter=quarter, time_of_day=time_of_day, course_format=course_format
+            )
+
+    def results():
+        for position, courses in engine.search_many(queries()):
+            yield {"index": position, "id": profiles[position].get("id"), "courses": sorted(courses)}
+
+    return results()
@@ -0,0 +1,84 @@
+import re
+
+""" Section and meeting time handling for the Terms table """
+
+# SearchPage.js time filter --> [start, end) in minutes after midnight
+TIME_RANGES = {
+    "morning": (0, 12 * 60),
+    "afternoon": (12 * 60, 17 * 60),
+    "evening": (17 * 60, 24 * 60)
+}
+
+# websoc building codes used for sections without a classroom
+ONLINE_BUILDINGS = {"ON", "ONLINE", "REMOTE"}
+
+TIME_PATTERN = re.compile(r"^\s*(\d{1,2}):(\d{2})\s*([ap]m?)?\s*$", re.IGNORECASE)
+
+def to_minutes(value):
+    """
+    to_minutes: meeting time as minutes after midnight, None if unknown
+        accepts websoc {"hour": 14, "minute": 0} objects and "14:00" / "2:00pm" strings
+    """
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        if value.get("hour") is None:
+            return None
+        return int(value["hour"]) * 60 + int(value.get("minute") or 0)
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    match = TIME_PATTERN.match(str(value))
+    if not match:
+        return None
+    hour, minute, suffix = int(match.group(1)), int(match.group(2)), match.group(3)
+    if suffix:
+        hour = hour % 12 + (12 if suffix.lower().startswith("p") else 0)
+    return hour * 60 + minute
+
+def section_format(building):
+    if not building or building == "TBA":
+        return None
+    return "online" if building.upper() in ONLINE_BUILDINGS else "in-person"
+
+def section_code(value):
+    # websoc section codes are 5 digit numbers, 0 marks a term listed without section data
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def term_rows(cid, term):
+    """
+    term_rows: Terms rows for one entry of a course's "terms" list
+        term: "2026 Spring" or {"term": "2026 Spring", "sections": [...]} as merged by data_collection
+        one row per section meeting, or a single placeholder row when there are no sections
+    """
+    sections = []
+    if isinstance(term, dict):
+        sections = term.get("sections", [])
+        term = term["term"]
+    year, quarter = term.lower().split()
+
+    if not sections:
+        return [(cid, 0, year, quarter, None, None, None, None, None, None, None, 0)]
+
+    rows = []
+    meetings = {} # section code --> meetings seen so far
+    for section in sections:
+        code = section_code(section.get("sectionCode"))
+        meeting = meetings.get(code, 0)
+        meetings[code] = meeting + 1
+        building = section.get("building")
+        rows.append((
+            cid, code, year, quarter,
+            section.get("sectionType"),
+            section_format(building),
+            building,
+            section.get("room"),
+            to_minutes(section.get("startTime")),
+            to_minutes(section.get("endTime")),
+            section.get("days"),
+            meeting
+        ))
+    return rows
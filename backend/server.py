@@ -0,0 +1,291 @@
+import asyncio
+import json
+import mimetypes
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qsl, unquote
+
+import metrics
+import sql_index
+from search_api import run_search, run_prereqs, run_plan, run_schedule, run_batch, run_suggest, run_coverage
+
+""" Async HTTP server for the frontend pages and /api/search
+
+    Run: python server.py [port] [db_path]
+    then open http://127.0.0.1:8000/
+"""
+
+PORT = 8000
+# METRICS=1 turns on instrumentation (see metrics.py), SLOW_QUERY_MS sets the slow query log threshold
+METRICS = os.environ.get("METRICS", "") not in ("", "0")
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", metrics.SLOW_QUERY_MS))
+DB_WORKERS = 8 # threads running SQLite reads, each keeps its pooled connection
+KEEPALIVE_TIMEOUT = 15 # seconds an idle keep-alive connection stays open
+STREAM_BATCH = 64 # streamed lines produced per trip to the db thread pool
+MAX_BODY = 1 << 20
+MAX_HEADERS = 100
+
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "frontend")
+
+STATUS_TEXT = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error"
+}
+
+class HTTPError(Exception):
+    def __init__(self, status, message=""):
+        super().__init__(message)
+        self.status = status
+
+class SearchServer():
+    """
+
+    HTTP/1.1 server on asyncio streams
+
+    Member Variables:
+        -db_path: database served by the API
+        -executor: bounded thread pool for SQLite reads, the event loop never touches the database
+        -routes: {(method, path): handler}, handlers are coroutines taking (query, body)
+
+    Connections are kept alive between requests until the client closes them,
+    sends Connection: close, or stays idle for KEEPALIVE_TIMEOUT seconds.
+
+    """
+    def __init__(self, db_path=sql_index.DB_PATH, workers=DB_WORKERS):
+        self.db_path = db_path
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="db")
+        self.routes = {
+            ("GET", "/api/search"): self.search,
+            ("POST", "/api/search"): self.search,
+            ("GET", "/api/prereqs"): self.prereqs,
+            ("POST", "/api/prereqs"): self.prereqs,
+            ("GET", "/api/plan"): self.plan,
+            ("POST", "/api/plan"): self.plan,
+            ("GET", "/api/schedule"): self.schedule,
+            ("GET", "/api/coverage"): self.coverage,
+            ("POST", "/api/coverage"): self.coverage,
+            ("POST", "/api/batch"): self.batch,
+            ("GET", "/api/suggest"): self.suggest,
+            ("GET", "/api/health"): self.health,
+            ("GET", "/api/metrics"): self.metrics_json,
+            ("GET", "/metrics"): self.metrics_text
+        }
+
+    async def run_db(self, fn, *args):
+        # each handler call is one metrics request, named after the function
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, metrics.track, fn.__name__, fn, *args)
+
+    async def search(self, query, body):
+        profile = body.get("profile") if isinstance(body, dict) else None
+        try:
+            return await self.run_db(run_search, query, profile, self.db_path)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+    async def prereqs(self, query, body):
+        profile = body.get("profile") if isinstance(body, dict) else None
+        try:
+            return await self.run_db(run_prereqs, query, profile, self.db_path)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+    async def plan(self, query, body):
+        profile = body.get("profile") if isinstance(body, dict) else None
+        try:
+            return await self.run_db(run_plan, query, profile, self.db_path)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+    async def coverage(self, query, body):
+        profile = body.get("profile") if isinstance(body, dict) else None
+        try:
+            return await self.run_db(run_coverage, query, profile, self.db_path)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+    async def schedule(self, query, body):
+        try:
+            return await self.run_db(run_schedule, query, None, self.db_path)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+    async def suggest(self, query, body):
+        try:
+            return await self.run_db(run_suggest, query, None, self.db_path)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+
+    async def batch(self, query, body):
+        # newline delimited json, one line per profile, sent as each chunk of profiles is done
+        try:
+            results = await self.run_db(run_batch, query, body, self.db_path)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        return "application/x-ndjson", results
+
+    async def stream(self, writer, results):
+        # chunked transfer encoding, the generator is advanced on the db threads
+        # and each chunk counts as a run_batch request, that is where the searching happens
+        # returns False if the generator failed part way, the response is then cut short
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                lines = await loop.run_in_executor(
+                    self.executor, metrics.track, "run_batch", _take_lines, results, STREAM_BATCH)
+            except Exception as e:
+                print("Error streaming response:", repr(e))
+                return False
+            if not lines:
+                break
+            data = "".join(lines).encode()
+            writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+        return True
+
+    async def health(self, query, body):
+        return {"ok": True}
+
+    async def metrics_json(self, query, body):
+        return metrics.snapshot()
+
+    async def metrics_text(self, query, body):
+        # Prometheus scrape endpoint
+        return "text/plain; version=0.0.4", metrics.prometheus_text().encode()
+
+    async def static(self, path):
+        if path == "/":
+            path = "/SearchPage.html"
+        root = os.path.realpath(FRONTEND_DIR)
+        file_path = os.path.realpath(os.path.join(root, unquote(path).lstrip("/")))
+        if not file_path.startswith(root + os.sep) or not os.path.isfile(file_path):
+            raise HTTPError(404)
+        with open(file_path, "rb") as f:
+            content = f.read()
+        content_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        return content_type, content
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            if url.path.startswith("/api/"):
+                raise HTTPError(405 if any(p == url.path for _, p in self.routes) else 404)
+            if method != "GET":
+                raise HTTPError(405)
+            return await self.static(url.path)
+
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            raise HTTPError(400, "invalid json body")
+        result = await handler(dict(parse_qsl(url.query)), data)
+        if isinstance(result, tuple):
+            # handler already produced (content type, body)
+            return result
+        return "application/json", json.dumps(result).encode()
+
+    async def read_request(self, reader):
+        request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+        if not request_line:
+            return None
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(400)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise HTTPError(400)
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "invalid Content-Length")
+        if length < 0:
+            raise HTTPError(400, "invalid Content-Length")
+        if length > MAX_BODY:
+            raise HTTPError(413)
+        body = await reader.readexactly(length) if length else b""
+        return method, target, version, headers, body
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await self.read_request(reader)
+                    if request is None:
+                        break
+                    method, target, version, headers, body = request
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = (connection != "close") if version == "HTTP/1.1" else (connection == "keep-alive")
+                    status = 200
+                    content_type, content = await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    status = e.status
+                    content_type = "application/json"
+                    content = json.dumps({"error": str(e) or STATUS_TEXT.get(status, "")}).encode()
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    print("Error handling request:", repr(e))
+                    status = 500
+                    content_type = "application/json"
+                    content = json.dumps({"error": "internal error"}).encode()
+
+                streaming = not isinstance(content, bytes)
+                length = "Transfer-Encoding: chunked" if streaming else f"Content-Length: {len(content)}"
+                head = (
+                    f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                    f"Content-Type: {content_type}\r\n"
+                    f"{length}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                    "\r\n"
+                ).encode("latin-1")
+                if streaming:
+                    writer.write(head)
+                    if not await self.stream(writer, content):
+                        break
+                else:
+                    writer.write(head + content)
+                    await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=PORT):
+        # compile the in-memory catalog and typeahead index before the first request instead of during it
+        await self.run_db(sql_index.get_engine(self.db_path).completion_index)
+        server = await asyncio.start_server(self.handle, host, port, backlog=1024)
+        print(f"Serving on http://{host}:{port}/")
+        async with server:
+            await server.serve_forever()
+
+def _take_lines(results, count):
+    lines = []
+    for item in results:
+        lines.append(json.dumps(item) + "\n")
+        if len(lines) == count:
+            break
+    return lines
+
+def main(port=PORT, db_path=sql_index.DB_PATH):
+    if METRICS:
+        metrics.enable(SLOW_QUERY_MS)
+    asyncio.run(SearchServer(db_path).serve(port=int(port)))
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
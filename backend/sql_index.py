@@ -1,5 +1,26 @@
 import sqlite3
 import json
+import heapq
+import hashlib
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import metrics
+from autocomplete import CompletionIndex
+from batch_search import search_batch, CHUNK_SIZE
+from catalog import load_catalog
+from connection import get_connection, invalidate
+from coverage import cover_requirements, feasible_bits, PLANS, MAX_COURSES
+from degree_planner import plan_degree, MAX_QUARTERS, MAX_UNITS
+from fuzzy_index import trigram_rows, fuzzy_search, unknown_terms
+from prereq_graph import PrereqGraph
+from json_stream import iter_json_array
+from query_cache import RESULT_CACHE, db_version, bump_db_version
+from sections import TIME_RANGES, term_rows
+from text_index import text_rows, bm25_search
 
 """ Run database.py and index.py before running this file """
 
@@ -20,148 +41,28 @@ GE_CATEGORIES = {
 
 DB_PATH = "courses.db"
 
-class CourseSearch():
-    """
-
-    Class for creating queries and retrieving results
-
-    Member Variables:
-        -db_path: path to database
-        -course: set containing course ids
-        -majors: set containing major ids
-        -minors: set containing minor ids
-        -specializations: set containing specialization ids
-        -completed: set containing completed prerequisites
-
-    To create a query:
-        -Initialize a CourseSearch object
-        -Add majors, minors, etc
-        -Call the search method
-
-    """
-    def __init__(self, db_path=DB_PATH):
-        self.db_path = db_path
-        self.courses = set()
-        self.majors = set()
-        self.minors = set()
-        self.specializations = set()
-        self.completed = set()
-
-    def add_major(self, major_id):
-        self.majors.add(major_id)
-
-    def remove_major(self, major_id):
-        self.majors.remove(major_id)
-
-    def add_minor(self, minor_id):
-        self.minors.add(minor_id)
-
-    def remove_minor(self, minor_id):
-        self.minors.remove(minor_id)
-
-    def add_specialization(self, spec):
-        self.specializations.add(spec)
-
-    def remove_specialization(self, spec):
-        self.specializations.remove(spec)
+# ranking weights (tune later)
+W_MAJOR = 4.0
+W_MINOR = 2.0
+W_NO_PREREQ = 0.5
 
-    def add_prerequisite(self, course_id):
-        if (type(course_id) is tuple):
-            course_id = course_id[0]
-        self.completed.add(course_id)
+BATCH_SIZE = 5000 # rows per executemany batch in create_index
 
-    def _add_sqlite_result_to_set(self, sqlite_res: tuple, set_out: set):
-        """
-        takes sqlite output in the form of ((X,), (Y,), (Z,)) and adds X, Y, and Z to a set
-        """
-        for res in sqlite_res:
-            set_out.add(res[0])
-
-    def search(self, year=None, quarter=None):
-        if quarter: quarter = quarter.lower()
-        for major_id in self.majors:
-            sql_out = filter_course_major(major_id, self.db_path)
-            self._add_sqlite_result_to_set(sql_out, self.courses)
-
-        for minor_id in self.minors:
-            sql_out = filter_course_minor(minor_id, self.db_path)
-            self._add_sqlite_result_to_set(sql_out, self.courses)
-        
-        for course_id in self.completed:
-            try:
-                self.courses.remove(course_id)
-            except KeyError:
-                pass
-
-        term_results = filter_course_term(year, quarter, self.db_path)
-        if len(self.majors) == 0:
-            self.courses = set(term_results)
-        else:
-            term_set = set()
-            self._add_sqlite_result_to_set(term_results, term_set)
-            self.courses = term_set & self.courses
-
-        results = set()
-        for course in self.courses:
-            prereqs_completed = True
-            for prereq in get_prerequisites(course, self.db_path):
-                if (prereq[0] not in self.completed):
-                    prereqs_completed = False
-                    break
-            if prereqs_completed:
-                results.add(course)
-        return results
-    
-    def search_ranked(self, year=None, quarter=None, k=10):
-        feasible = self.search(year, quarter)
-        ranked = []
-        for cid in feasible:
-            score, reasons = score_course_simple(
-                cid, self.db_path, self.majors, self.minors
-            )
-            meta = get_course_meta(cid, self.db_path)
-            
-            ranked.append({
-                "course_id": cid,
-                "score": score,
-                "reasons": reasons,
-                **meta
-            })
-        ranked.sort(key=lambda x: x["score"], reverse=True)
-        return ranked[:k]
-    
+# fast-load settings while create_index holds its transaction
+LOAD_PRAGMAS = [
+    "PRAGMA journal_mode=MEMORY",
+    "PRAGMA synchronous=OFF",
+    "PRAGMA cache_size=-200000",
+    "PRAGMA temp_store=MEMORY"
+]
 
+# restored once the load is committed
+SERVE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL"
+]
 
-def create_index(path: str, course_data: list[dict]):
-    
-    """
-    create_index: creates tables and indexes for provided course data
-        path: path to database
-        type: str
-
-        course_data: list of course json data collected from 
-        type: list[dict]
-
-    Database structure:
-    
-        Buildings: Building names and locations
-        Courses: General course information
-        GenEdRequirements: Stores which courses fulfill each GE category
-        Majors: General major information
-        MajorCourses: Stores required courses for each major
-        Minors: General minor information
-        MinorCourses: Stores required courses for each minor
-        Prerequisites: Stores which courses have prerequisites
-        Specializations: Specialization information
-        SpecializationCourses Stores required courses for each specialization
-        Terms: Stores term-specific course information
-    
-    """
-    conn = sqlite3.connect(path)
-    cursor = conn.cursor()
-
-    cursor.executescript('''
-                                 
+SCHEMA = '''
         CREATE TABLE IF NOT EXISTS Buildings (
             building_id TEXT PRIMARY KEY,
             location TEXT NOT NULL
@@ -178,16 +79,18 @@ def create_index(path: str, course_data: list[dict]):
                          
         CREATE TABLE IF NOT EXISTS Terms (
             course_id TEXT NOT NULL,
-            course_code INTEGER,
+            course_code INTEGER NOT NULL,
             year INTEGER NOT NULL, 
             quarter TEXT NOT NULL,
+            section_type TEXT,
             format TEXT,
             building_id TEXT,
-            building_number INTEGER,
-            start_time TEXT,
-            end_time TEXT,
+            building_number TEXT,
+            start_time INTEGER,
+            end_time INTEGER,
             days TEXT,
-            PRIMARY KEY (course_code, year, quarter),
+            meeting INTEGER NOT NULL,
+            PRIMARY KEY (course_id, year, quarter, course_code, meeting),
             FOREIGN KEY (course_id) REFERENCES Courses(course_id),
             FOREIGN KEY (building_id, building_number) REFERENCES Buildings(building_id, building_number)
         );
@@ -226,7 +129,8 @@ def create_index(path: str, course_data: list[dict]):
                          
         CREATE TABLE IF NOT EXISTS Minors (
             minor_id TEXT,
-            minor_name TEXT NOT NULL
+            minor_name TEXT NOT NULL,
+            PRIMARY KEY (minor_id)
         );
                          
         CREATE TABLE IF NOT EXISTS MinorCourses (
@@ -260,87 +164,791 @@ def create_index(path: str, course_data: list[dict]):
             FOREIGN KEY (course_id) REFERENCES Courses(course_id)
         );
                          
-        CREATE INDEX IF NOT EXISTS idx_courseterms
-        ON InvertedCourseIndex(course_id, term);
+        CREATE TABLE IF NOT EXISTS CourseDocuments (
+            course_id TEXT PRIMARY KEY,
+            length INTEGER NOT NULL,
+            FOREIGN KEY (course_id) REFERENCES Courses(course_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS CourseTrigrams (
+            course_id TEXT,
+            trigram TEXT,
+            PRIMARY KEY (course_id, trigram),
+            FOREIGN KEY (course_id) REFERENCES Courses(course_id)
+        );
+
+        CREATE TABLE IF NOT EXISTS CourseFingerprints (
+            course_id TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            FOREIGN KEY (course_id) REFERENCES Courses(course_id)
+        );
                          
-    ''')
-
-    for course in course_data:
-        cid = course["id"]
-        cdep = course["department"]
-        cnumber = course["courseNumber"]
-        ctitle = course["title"]
-        cmin_units = course["minUnits"]
-        cmax_units = course["maxUnits"]
-        cursor.execute('''
-            INSERT OR REPLACE INTO Courses(course_id, department, 
-                                           course_number, course_title,
-                                           min_units, max_units)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (cid, cdep, cnumber, ctitle, cmin_units, cmax_units))    
-
-        for ge in course["geList"]:
-            ge_id = GE_CATEGORIES[ge]
-            cursor.execute('''
-                INSERT OR REPLACE INTO GenEdRequirements(course_id, ge_category, ge_id)
-                VALUES (?, ?, ?)       
-            ''', (cid, ge, ge_id))
-
-        for prereq in course["prerequisites"]:
-            prereq_id = prereq["id"]
-            cursor.execute('''
-                INSERT OR REPLACE INTO Prerequisites(course_id, prereq_id)
-                VALUES (?, ?)
-            ''', (cid, prereq_id))
-
-        for term in course["terms"]:
-            year, quarter = term.lower().split()
-            cursor.execute('''
-                INSERT OR REPLACE INTO Terms(course_id, year, quarter)
-                VALUES (?, ?, ?)
-            ''', (cid, year, quarter))
-
-    conn.commit()
+'''
+
+# built after the data is loaded
+SECONDARY_INDEXES = {
+    "idx_term_courses": "CREATE INDEX IF NOT EXISTS idx_term_courses ON Terms(year, quarter, course_id)",
+    "idx_term_times": "CREATE INDEX IF NOT EXISTS idx_term_times ON Terms(year, quarter, start_time)",
+    "idx_courseterms": "CREATE INDEX IF NOT EXISTS idx_courseterms ON InvertedCourseIndex(course_id, term)",
+    "idx_termcourses": "CREATE INDEX IF NOT EXISTS idx_termcourses ON InvertedCourseIndex(term)",
+    "idx_trigramcourses": "CREATE INDEX IF NOT EXISTS idx_trigramcourses ON CourseTrigrams(trigram, course_id)"
+}
+
+INSERT_SQL = {
+    "Courses": '''
+        INSERT OR REPLACE INTO Courses(course_id, department,
+                                       course_number, course_title,
+                                       min_units, max_units)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    "GenEdRequirements": '''
+        INSERT OR REPLACE INTO GenEdRequirements(course_id, ge_category, ge_id)
+        VALUES (?, ?, ?)
+    ''',
+    "Prerequisites": '''
+        INSERT OR REPLACE INTO Prerequisites(course_id, prereq_id)
+        VALUES (?, ?)
+    ''',
+    "Terms": '''
+        INSERT OR REPLACE INTO Terms(course_id, course_code, year, quarter,
+                                     section_type, format, building_id, building_number,
+                                     start_time, end_time, days, meeting)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+    "InvertedCourseIndex": '''
+        INSERT OR REPLACE INTO InvertedCourseIndex(course_id, term, frequency)
+        VALUES (?, ?, ?)
+    ''',
+    "CourseDocuments": '''
+        INSERT OR REPLACE INTO CourseDocuments(course_id, length)
+        VALUES (?, ?)
+    ''',
+    "CourseTrigrams": '''
+        INSERT OR REPLACE INTO CourseTrigrams(course_id, trigram)
+        VALUES (?, ?)
+    ''',
+    "CourseFingerprints": '''
+        INSERT OR REPLACE INTO CourseFingerprints(course_id, digest)
+        VALUES (?, ?)
+    '''
+}
+
+# tables holding rows derived from one course record, cleared before it is re-inserted
+COURSE_CHILD_TABLES = [
+    "GenEdRequirements",
+    "Prerequisites",
+    "Terms",
+    "InvertedCourseIndex",
+    "CourseDocuments",
+    "CourseTrigrams"
+]
+
+@dataclass(frozen=True)
+class CourseQuery():
+    """
+
+    One search request, immutable and hashable so it doubles as a cache key
+
+    Member Variables:
+        -majors, minors, specializations: program ids
+        -completed: completed course ids
+        -year, quarter: term filter, either may be None
+        -time_of_day: "morning", "afternoon" or "evening", None for any time
+        -course_format: "in-person" or "online", None for any format
+
+    """
+    majors: frozenset = frozenset()
+    minors: frozenset = frozenset()
+    specializations: frozenset = frozenset()
+    completed: frozenset = frozenset()
+    year: int = None
+    quarter: str = None
+    time_of_day: str = None
+    course_format: str = None
+
+    def __post_init__(self):
+        # normalize so equal searches hash the same however they were built
+        for name in ("majors", "minors", "specializations", "completed"):
+            object.__setattr__(self, name, frozenset(getattr(self, name)))
+        if self.quarter:
+            object.__setattr__(self, "quarter", self.quarter.lower())
+
+class SearchEngine():
+    """
+
+    Shared search engine for one database
+
+    Member Variables:
+        -db_path: path to database
+        -cache: QueryCache for search results, None to always query the database
+        -use_catalog: answer searches from an in-memory Catalog (see catalog.py) instead of SQL
+
+    The engine holds no per-request state, every method takes a CourseQuery.
+    Database access goes through the per-thread pooled connections, so one
+    engine can serve any number of threads at once. The catalog snapshot,
+    prerequisite graph and completion index are swapped for fresh ones when
+    db_version changes, so any write to the database rebuilds them.
+
+    """
+    def __init__(self, db_path=DB_PATH, cache=RESULT_CACHE, use_catalog=True):
+        self.db_path = db_path
+        self.cache = cache
+        self.use_catalog = use_catalog
+        self._cache_prefix = os.path.abspath(db_path)
+        self._catalog = None
+        self._snapshot = None
+        self._graph = None
+        self._completions = None
+        self._catalog_lock = threading.RLock()
+
+    def catalog(self, version=None):
+        """
+        catalog: the Catalog for the current database load, None when use_catalog is off
+        """
+        if not self.use_catalog:
+            return None
+        if version is None:
+            version = db_version(self.db_path)
+        catalog = self._catalog
+        if catalog is None or catalog.version != version:
+            with self._catalog_lock:
+                catalog = self._catalog
+                if catalog is None or catalog.version != version:
+                    with metrics.stage("load_catalog"):
+                        catalog = self._catalog = load_catalog(self.db_path)
+        return catalog
+
+    def snapshot(self, version=None):
+        """
+        snapshot: a Catalog for the current database load even when use_catalog is off,
+            for the features that only run on one (prerequisite graph, typeahead, coverage)
+        """
+        if version is None:
+            version = db_version(self.db_path)
+        catalog = self.catalog(version)
+        if catalog is not None:
+            return catalog
+        catalog = self._snapshot
+        if catalog is None or catalog.version != version:
+            with self._catalog_lock:
+                catalog = self._snapshot
+                if catalog is None or catalog.version != version:
+                    with metrics.stage("load_catalog"):
+                        catalog = self._snapshot = load_catalog(self.db_path)
+        return catalog
+
+    def prereq_graph(self) -> PrereqGraph:
+        """
+        prereq_graph: the PrereqGraph for the current database load, built on first use
+        """
+        version = db_version(self.db_path)
+        graph = self._graph
+        if graph is None or graph.catalog.version != version:
+            with self._catalog_lock:
+                graph = self._graph
+                if graph is None or graph.catalog.version != version:
+                    catalog = self.snapshot(version)
+                    with metrics.stage("prereq_graph"):
+                        graph = self._graph = PrereqGraph(catalog)
+        return graph
+
+    def completion_index(self) -> CompletionIndex:
+        """
+        completion_index: the CompletionIndex for the current database load, built on first use
+        """
+        version = db_version(self.db_path)
+        index = self._completions
+        if index is None or index.version != version:
+            with self._catalog_lock:
+                index = self._completions
+                if index is None or index.version != version:
+                    catalog = self.snapshot(version)
+                    with metrics.stage("completion_index"):
+                        index = self._completions = CompletionIndex(catalog)
+        return index
+
+    def _cached(self, key, compute):
+        with metrics.stage("db_version"):
+            version = db_version(self.db_path)
+        if self.cache is None:
+            return compute(version)
+        key = (self._cache_prefix, *key)
+        with metrics.stage("cache"):
+            value = self.cache.get(key, version)
+        if value is None:
+            value = compute(version)
+            self.cache.put(key, version, value)
+        return value
+
+    def search(self, query: CourseQuery) -> set:
+        with metrics.request("search"):
+            return set(self._cached(("search", query), lambda version: self._search(query, version)))
+
+    def _search(self, query, version):
+        args = (query.majors, query.minors, query.completed, query.year, query.quarter)
+        catalog = self.catalog(version)
+        if catalog is not None:
+            return frozenset(catalog.search(*args, query.time_of_day, query.course_format,
+                                            query.specializations))
+        with metrics.stage("search_sql"):
+            return frozenset(search_feasible(*args, self.db_path, query.time_of_day, query.course_format,
+                                             query.specializations))
+
+    def search_many(self, queries, chunk_size=CHUNK_SIZE):
+        """
+        search_many: search for many CourseQuery objects, yields (position, set of course ids) in order
+            with the catalog the queries are evaluated together a chunk at a time (see batch_search.py),
+            results are not cached
+        """
+        catalog = self.catalog()
+        if catalog is None:
+            for position, query in enumerate(queries):
+                yield position, self.search(query)
+            return
+        yield from search_batch(catalog, queries, chunk_size)
+
+    def search_ranked(self, query: CourseQuery, k=10) -> list:
+        with metrics.request("search_ranked"):
+            ranked = self._cached(("search_ranked", query, k),
+                                  lambda version: self._search_ranked(query, k, version))
+            # callers get their own copies, the cached entry stays untouched
+            return [{**course, "reasons": list(course["reasons"])} for course in ranked]
+
+    def score(self, course_ids, query: CourseQuery) -> dict:
+        catalog = self.catalog()
+        with metrics.stage("score"):
+            if catalog is not None:
+                return _scores(catalog.memberships(course_ids, query.majors, query.minors))
+            return score_courses(course_ids, self.db_path, query.majors, query.minors)
+
+    def metas(self, course_ids) -> dict:
+        catalog = self.catalog()
+        with metrics.stage("metas"):
+            if catalog is not None:
+                return catalog.metas(course_ids)
+            return get_course_metas(course_ids, self.db_path)
+
+    def _search_ranked(self, query, k, version):
+        feasible = self._search(query, version)
+        scores = self.score(feasible, query)
+        with metrics.stage("rank"):
+            top = heapq.nlargest(k, scores.items(), key=lambda item: item[1][0])
+        metas = self.metas([cid for cid, _ in top])
+
+        ranked = []
+        for cid, (score, reasons) in top:
+            ranked.append({
+                "course_id": cid,
+                "score": score,
+                "reasons": reasons,
+                **metas[cid]
+            })
+        return ranked
+
+    def plan(self, query: CourseQuery, year=None, quarter=None, quarters=MAX_QUARTERS,
+             max_units=MAX_UNITS, include_summer=False) -> dict:
+        """
+        plan: multi-quarter plan for query's majors and minors, see degree_planner.plan_degree
+        """
+        with metrics.request("plan"):
+            graph = self.prereq_graph()
+            with metrics.stage("plan"):
+                return plan_degree(graph, query, year, quarter, quarters, max_units, include_summer)
+
+    def complete(self, text: str, k=10) -> list:
+        """
+        complete: typeahead suggestions for partially typed text, see autocomplete.CompletionIndex.complete
+        """
+        with metrics.request("complete"):
+            index = self.completion_index()
+            with metrics.stage("complete"):
+                return index.complete(text, k)
+
+    def cover(self, query: CourseQuery, ge_ids, limit=PLANS, max_courses=MAX_COURSES) -> dict:
+        """
+        cover: small sets of courses feasible for query that cover the most of its outstanding
+            requirements, see coverage.cover_requirements
+            ge_ids: GenEdRequirements.ge_id values the student still needs, together with
+                    query.specializations (one requirement each)
+            returns cover_requirements' result plus "satisfied": requirements a completed course already covers
+        """
+        with metrics.request("cover"):
+            catalog = self.snapshot()
+            with metrics.stage("cover"):
+                done = catalog.bits(query.completed)
+                outstanding = [(ge_id, catalog.ge.get(ge_id, 0)) for ge_id in ge_ids]
+                outstanding += [(spec, catalog.specializations.get(spec, 0)) for spec in sorted(query.specializations)]
+                requirements = []
+                satisfied = []
+                for name, bits in outstanding:
+                    if bits & done:
+                        satisfied.append(name)
+                    else:
+                        requirements.append((name, bits))
+                feasible = feasible_bits(catalog, query.completed, query.year, query.quarter,
+                                         query.time_of_day, query.course_format)
+                result = cover_requirements(catalog, requirements, feasible, limit, max_courses)
+            result["satisfied"] = satisfied
+            return result
+
+    def search_text(self, text: str, k=10) -> list:
+        """
+        search_text: BM25 keyword search over course codes, titles and descriptions,
+            switching to typo tolerant matching of titles and codes when a query word
+            appears in no course (and that finds anything)
+            returns up to k result dicts (course_id, score and course metadata), best first
+        """
+        with metrics.request("search_text"):
+            with metrics.stage("bm25"):
+                hits = bm25_search(text, self.db_path, k)
+            if not hits or unknown_terms(text, self.db_path):
+                with metrics.stage("fuzzy"):
+                    hits = fuzzy_search(text, self.db_path, k) or hits
+            metas = self.metas([cid for cid, _ in hits])
+            return [{"course_id": cid, "score": score, **metas[cid]} for cid, score in hits]
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+def get_engine(db_path=DB_PATH) -> SearchEngine:
+    """
+    get_engine: the shared SearchEngine (with RESULT_CACHE) for a database
+    """
+    key = os.path.abspath(db_path)
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = SearchEngine(db_path)
+        return _engines[key]
+
+class CourseSearch():
+    """
+
+    Class for creating queries and retrieving results
+
+    Member Variables:
+        -db_path: path to database
+        -majors: set containing major ids
+        -minors: set containing minor ids
+        -specializations: set containing specialization ids
+        -completed: set containing completed prerequisites
+        -engine: SearchEngine the searches run on, shared by every CourseSearch for db_path
+
+    To create a query:
+        -Initialize a CourseSearch object
+        -Add majors, minors, etc
+        -Call the search method
+
+    A CourseSearch is cheap, per-request state. Each search call snapshots it into a
+    CourseQuery, so results never depend on earlier calls.
+
+    """
+    def __init__(self, db_path=DB_PATH, engine=None):
+        self.db_path = db_path
+        self.engine = engine if engine is not None else get_engine(db_path)
+        self.majors = set()
+        self.minors = set()
+        self.specializations = set()
+        self.completed = set()
+
+    def add_major(self, major_id):
+        self.majors.add(major_id)
+
+    def remove_major(self, major_id):
+        self.majors.remove(major_id)
+
+    def add_minor(self, minor_id):
+        self.minors.add(minor_id)
+
+    def remove_minor(self, minor_id):
+        self.minors.remove(minor_id)
+
+    def add_specialization(self, spec):
+        self.specializations.add(spec)
+
+    def remove_specialization(self, spec):
+        self.specializations.remove(spec)
+
+    def add_prerequisite(self, course_id):
+        if (type(course_id) is tuple):
+            course_id = course_id[0]
+        self.completed.add(course_id)
+
+    def query(self, year=None, quarter=None, time_of_day=None, course_format=None) -> CourseQuery:
+        return CourseQuery(self.majors, self.minors, self.specializations, self.completed,
+                           year, quarter, time_of_day, course_format)
+
+    def search(self, year=None, quarter=None, time_of_day=None, course_format=None):
+        return self.engine.search(self.query(year, quarter, time_of_day, course_format))
+    
+    def search_ranked(self, year=None, quarter=None, k=10, time_of_day=None, course_format=None):
+        return self.engine.search_ranked(self.query(year, quarter, time_of_day, course_format), k)
+
+    def search_text(self, query: str, k=10):
+        return self.engine.search_text(query, k)
+
+    def plan(self, year=None, quarter=None, quarters=MAX_QUARTERS, max_units=MAX_UNITS, include_summer=False):
+        return self.engine.plan(self.query(), year, quarter, quarters, max_units, include_summer)
+    
+
+
+def create_index(path: str, course_data, batch_size=BATCH_SIZE, incremental=False):
+    
+    """
+    create_index: creates tables and indexes for provided course data
+        path: path to database
+        type: str
+
+        course_data: course json data collected from data_collection.py
+        type: list[dict] or any iterable of dicts (see load_index)
+
+        batch_size: rows buffered per table before each executemany
+        type: int
+
+        incremental: only apply courses that changed since the last load (see update_index)
+        type: bool
+
+    Database structure:
+    
+        Buildings: Building names and locations
+        Courses: General course information
+        GenEdRequirements: Stores which courses fulfill each GE category
+        Majors: General major information
+        MajorCourses: Stores required courses for each major
+        Minors: General minor information
+        MinorCourses: Stores required courses for each minor
+        Prerequisites: Stores which courses have prerequisites
+        Specializations: Specialization information
+        SpecializationCourses Stores required courses for each specialization
+        Terms: Stores term-specific course information, one row per section meeting
+               (start_time/end_time in minutes after midnight, course_code 0 when
+               the term has no section data)
+        InvertedCourseIndex: Stores term frequencies of course codes, titles and descriptions
+        CourseDocuments: Stores the token count of each indexed course (for BM25)
+        CourseTrigrams: Stores the trigrams of each course's title words and id (for typo tolerant search)
+        CourseFingerprints: Stores a hash of each loaded course record (for incremental loads)
+    
+    """
+    if incremental:
+        return update_index(path, course_data, batch_size)
+
+    # pooled readers reopen on their next query --> the file may have been replaced since they opened
+    invalidate(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    for pragma in LOAD_PRAGMAS:
+        try:
+            conn.execute(pragma)
+        except sqlite3.OperationalError:
+            # leaving WAL needs the file to itself --> readers still connected, load in WAL
+            pass
+    cursor = conn.cursor()
+    _migrate(cursor)
+    cursor.executescript(SCHEMA)
+
+    counts = {table: 0 for table in INSERT_SQL}
+    elapsed = {table: 0.0 for table in INSERT_SQL}
+    pending = {table: [] for table in INSERT_SQL}
+
+    def flush(table):
+        start = time.perf_counter()
+        cursor.executemany(INSERT_SQL[table], pending[table])
+        elapsed[table] += time.perf_counter() - start
+        counts[table] += len(pending[table])
+        pending[table].clear()
+
+    # load everything in one transaction, secondary indexes are rebuilt afterwards
+    cursor.execute("BEGIN")
+    try:
+        for name in SECONDARY_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+        for course in course_data:
+            for table, rows in course_rows(course).items():
+                pending[table].extend(rows)
+                if len(pending[table]) >= batch_size:
+                    flush(table)
+        for table in pending:
+            flush(table)
+
+        start = time.perf_counter()
+        for sql in SECONDARY_INDEXES.values():
+            cursor.execute(sql)
+        index_time = time.perf_counter() - start
+
+        bump_db_version(cursor)
+        cursor.execute("COMMIT")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+
+    for pragma in SERVE_PRAGMAS:
+        conn.execute(pragma)
+    conn.isolation_level = ""
+
+    for table in INSERT_SQL:
+        rate = counts[table] / elapsed[table] if elapsed[table] else 0
+        print(f"  {table}: {counts[table]} rows in {elapsed[table]:.2f}s ({rate:,.0f} rows/sec)")
+    print(f"  secondary indexes built in {index_time:.2f}s")
     print("Database created at", path)
     return conn
 
-def filter_course_term(year: int, quarter: str, db_path):
-    quarter = quarter.lower()
-    conn = sqlite3.connect(db_path)
+def _migrate(cursor):
+    """
+    _migrate: brings a database built by an older create_index up to the current SCHEMA
+    """
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(Terms)")]
+    if columns and "meeting" not in columns:
+        # Terms predates section rows --> rebuild it, and make the next
+        # incremental load treat every course as changed so it is refilled
+        cursor.execute("DROP TABLE Terms")
+        if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'CourseFingerprints'").fetchone():
+            cursor.execute("DELETE FROM CourseFingerprints")
+    tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if "CourseFingerprints" in tables and "CourseTrigrams" not in tables:
+        # built before typo tolerant search --> refill every course on the next incremental load
+        cursor.execute("DELETE FROM CourseFingerprints")
+
+def course_rows(course: dict, digest=None) -> dict:
+    """
+    course_rows: rows to insert for one course record, keyed by table
+        digest: course_digest(course) when the caller already has it
+    """
+    cid = course["id"]
+    rows = {
+        "Courses": [(cid, course["department"], course["courseNumber"], course["title"],
+                     course["minUnits"], course["maxUnits"])],
+        "GenEdRequirements": [(cid, ge, GE_CATEGORIES[ge]) for ge in course["geList"]],
+        "Prerequisites": [(cid, prereq["id"]) for prereq in course["prerequisites"]],
+        "Terms": []
+    }
+
+    for term in course["terms"]:
+        rows["Terms"].extend(term_rows(cid, term))
+
+    postings, document = text_rows(course)
+    rows["InvertedCourseIndex"] = postings
+    rows["CourseDocuments"] = [document]
+    rows["CourseTrigrams"] = trigram_rows(course)
+    rows["CourseFingerprints"] = [(cid, digest or course_digest(course))]
+    return rows
+
+def course_digest(course: dict) -> str:
+    encoded = json.dumps(course, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+def update_index(path: str, course_data, batch_size=BATCH_SIZE) -> dict:
+    """
+    update_index: applies only the courses that changed since the last load
+        path: path to an existing database built by create_index
+        course_data: the full current catalog (list or iterable of course dicts)
+
+    Each record is hashed and compared with CourseFingerprints. New and changed
+    courses have their rows replaced, courses missing from course_data are deleted,
+    everything else is left alone. The delta is applied in one transaction while
+    readers keep using their WAL snapshot, so there is no downtime.
+
+    returns counts of added, updated, deleted and unchanged courses
+    """
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
     cursor = conn.cursor()
+    _migrate(cursor)
+    cursor.executescript(SCHEMA)
+
+    stored = dict(cursor.execute("SELECT course_id, digest FROM CourseFingerprints"))
+    stats = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+    pending = {table: [] for table in INSERT_SQL}
+
+    def flush():
+        for table, rows in pending.items():
+            cursor.executemany(INSERT_SQL[table], rows)
+            rows.clear()
+
+    def delete_courses(course_ids, tables):
+        for table in tables:
+            cursor.executemany(f"DELETE FROM {table} WHERE course_id = ?",
+                               [(cid,) for cid in course_ids])
+
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        # a migration may have dropped a table together with its indexes
+        for sql in SECONDARY_INDEXES.values():
+            cursor.execute(sql)
+
+        seen = set()
+        changed = []
+        for course in course_data:
+            cid = course["id"]
+            seen.add(cid)
+            # hash first, rows are only built for courses that changed
+            digest = course_digest(course)
+            if stored.get(cid) == digest:
+                stats["unchanged"] += 1
+                continue
+            stats["updated" if cid in stored else "added"] += 1
+
+            changed.append(cid)
+            for table, table_rows in course_rows(course, digest).items():
+                pending[table].extend(table_rows)
+            if len(changed) >= batch_size:
+                delete_courses(changed, COURSE_CHILD_TABLES)
+                flush()
+                changed.clear()
+        delete_courses(changed, COURSE_CHILD_TABLES)
+        flush()
+
+        removed = [cid for cid in stored if cid not in seen]
+        delete_courses(removed, COURSE_CHILD_TABLES + ["Courses", "CourseFingerprints"])
+        stats["deleted"] = len(removed)
+
+        if stats["added"] or stats["updated"] or stats["deleted"]:
+            bump_db_version(cursor)
+        cursor.execute("COMMIT")
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    conn.close()
+
+    print("Database updated at", path, stats)
+    return stats
+
+def load_index(path: str, json_path: str, batch_size=BATCH_SIZE, incremental=False):
+    """
+    load_index: streams course records from json_path into create_index
+    """
+    return create_index(path, iter_json_array(json_path), batch_size, incremental)
+
+# compiled search statements, keyed by which filters are present
+_SEARCH_SQL = {}
+
+def _compile_search(has_majors: bool, has_year: bool, has_quarter: bool,
+                    has_time=False, has_format=False) -> str:
+    key = (has_majors, has_year, has_quarter, has_time, has_format)
+    if key in _SEARCH_SQL:
+        return _SEARCH_SQL[key]
+
+    where = []
+    if has_year:
+        where.append("t.year = :year")
+    if has_quarter:
+        where.append("t.quarter = :quarter")
+    # at least one meeting starting in the time range / with the format (idx_term_times)
+    if has_time:
+        where.append("t.start_time >= :start_min AND t.start_time < :end_min")
+    if has_format:
+        where.append("t.format = :format")
+    # without a major every course offered in the term is a candidate
+    if has_majors:
+        where.append("t.course_id IN (SELECT course_id FROM wanted)")
+        where.append("t.course_id NOT IN (SELECT course_id FROM done)")
+    # every prerequisite has to be completed
+    where.append("""NOT EXISTS (
+            SELECT 1 FROM Prerequisites p
+            WHERE p.course_id = t.course_id
+              AND p.prereq_id NOT IN (SELECT course_id FROM done)
+        )""")
+
+    query = """
+        WITH done(course_id) AS (
+            SELECT value FROM json_each(:completed)
+        ),
+        wanted(course_id) AS (
+            SELECT course_id FROM MajorCourses
+            WHERE major_id IN (SELECT value FROM json_each(:majors))
+            UNION
+            SELECT course_id FROM MinorCourses
+            WHERE minor_id IN (SELECT value FROM json_each(:minors))
+            UNION
+            SELECT course_id FROM SpecializationCourses
+            WHERE specialization_id IN (SELECT value FROM json_each(:specializations))
+        )
+        SELECT DISTINCT t.course_id FROM Terms t
+        WHERE """ + "\n          AND ".join(where)
+    _SEARCH_SQL[key] = query
+    return query
+
+def search_feasible(majors, minors, completed, year, quarter, db_path,
+                    time_of_day=None, course_format=None, specializations=()) -> set:
+    """
+    search_feasible: courses offered in the term whose prerequisites are all completed
+        majors, minors: major/minor ids, their courses minus completed ones are the candidates
+        specializations: specialization ids, their courses join the candidates when there is a major
+        completed: completed course ids
+        year, quarter: term filter, either may be None
+        time_of_day: "morning", "afternoon" or "evening" (see TIME_RANGES), None for any time
+        course_format: "in-person" or "online", None for any format
+
+    The whole search runs as one statement, the id sets are passed in as json arrays
+    so the statement text only depends on which filters are present.
+    """
+    if quarter: quarter = quarter.lower()
+    start_min, end_min = TIME_RANGES[time_of_day] if time_of_day else (None, None)
+    query = _compile_search(bool(majors), bool(year), bool(quarter),
+                            bool(time_of_day), bool(course_format))
+    params = {
+        "majors": json.dumps(list(majors)),
+        "minors": json.dumps(list(minors)),
+        "specializations": json.dumps(list(specializations)),
+        "completed": json.dumps(list(completed)),
+        "year": year,
+        "quarter": quarter,
+        "start_min": start_min,
+        "end_min": end_min,
+        "format": course_format
+    }
+    rows = get_connection(db_path).execute(query, params).fetchall()
+    return {row[0] for row in rows}
+
+def filter_course_term(year: int, quarter: str, db_path):
+    if quarter: quarter = quarter.lower()
+    cursor = get_connection(db_path).cursor()
     if (year and quarter):
-        query = "SELECT course_id FROM Terms WHERE year = ? AND quarter = ?"
+        query = "SELECT DISTINCT course_id FROM Terms WHERE year = ? AND quarter = ?"
         results = cursor.execute(query, (year, quarter)).fetchall()
-    elif not year:
-        query = "SELECT course_id FROM Terms WHERE quarter = ?"
-        results = cursor.execute(query, (quarter)).fetchall()
-    elif not quarter:
-        query = "SELECT course_id FROM Terms WHERE year = ?"
-        results = cursor.execute(query, (year)).fetchall()
+    elif quarter:
+        query = "SELECT DISTINCT course_id FROM Terms WHERE quarter = ?"
+        results = cursor.execute(query, (quarter,)).fetchall()
+    elif year:
+        query = "SELECT DISTINCT course_id FROM Terms WHERE year = ?"
+        results = cursor.execute(query, (year,)).fetchall()
     else:
-        results = cursor.execute("SELECT course_id FROM Terms").fetchall()
+        results = cursor.execute("SELECT DISTINCT course_id FROM Terms").fetchall()
 
     return results
 
+def filter_course_time(year: int, quarter: str, time_of_day: str, db_path, course_format=None):
+    """
+    filter_course_time: courses with a meeting starting in the given part of the day
+        time_of_day: "morning", "afternoon" or "evening"
+        course_format: optionally also require "in-person" or "online"
+        runs as a range scan on idx_term_times
+    """
+    start_min, end_min = TIME_RANGES[time_of_day]
+    query = """
+        SELECT DISTINCT course_id FROM Terms
+        WHERE year = ? AND quarter = ? AND start_time >= ? AND start_time < ?
+    """
+    params = [year, quarter.lower(), start_min, end_min]
+    if course_format:
+        query += " AND format = ?"
+        params.append(course_format)
+    return get_connection(db_path).execute(query, params).fetchall()
+
 def filter_course_major(major_id: str, db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    cursor = get_connection(db_path).cursor()
     query = "SELECT course_id FROM MajorCourses WHERE major_id = ?"
     results = cursor.execute(query, (major_id,)).fetchall()
 
     return results
 
 def filter_course_minor(minor_id: str, db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    cursor = get_connection(db_path).cursor()
     query = "SELECT course_id FROM MinorCourses WHERE minor_id = ?"
     results = cursor.execute(query, (minor_id,)).fetchall()
 
     return results
 
 def get_prerequisites(course_id: str, db_path):
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    cursor = get_connection(db_path).cursor()
     query = "SELECT prereq_id FROM Prerequisites WHERE course_id = ?"
     results = cursor.execute(query, (course_id,)).fetchall()
     
@@ -348,13 +956,11 @@ def get_prerequisites(course_id: str, db_path):
 # def filter_prerequisites(course_id, db_path=DB_PATH):
 
 def get_course_meta(course_id: str, db_path: str):
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+    cur = get_connection(db_path).cursor()
     row = cur.execute("""
         SELECT department, course_number, course_title, min_units, max_units
         FROM Courses WHERE course_id = ?
     """, (course_id,)).fetchone()
-    conn.close()
 
     if not row:
         return {"dept": "", "code": course_id, "title": course_id, "min_units": None, "max_units": None}
@@ -363,32 +969,43 @@ def get_course_meta(course_id: str, db_path: str):
     return {"dept": dept, "code": f"{dept} {num}", "title": title, "min_units": min_u, "max_units": max_u}
 
 
+def get_course_metas(course_ids, db_path: str) -> dict:
+    """
+    get_course_metas: get_course_meta for many courses with one query
+        returns {course_id: meta}, missing courses get the same placeholder as get_course_meta
+    """
+    course_ids = list(course_ids)
+    rows = get_connection(db_path).execute("""
+        SELECT course_id, department, course_number, course_title, min_units, max_units
+        FROM Courses WHERE course_id IN (SELECT value FROM json_each(?))
+    """, (json.dumps(course_ids),)).fetchall()
+
+    metas = {}
+    for cid, dept, num, title, min_u, max_u in rows:
+        metas[cid] = {"dept": dept, "code": f"{dept} {num}", "title": title, "min_units": min_u, "max_units": max_u}
+    for cid in course_ids:
+        if cid not in metas:
+            metas[cid] = {"dept": "", "code": cid, "title": cid, "min_units": None, "max_units": None}
+    return metas
+
+
 def is_major_course(course_id: str, major_id: str, db_path: str) -> bool:
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+    cur = get_connection(db_path).cursor()
     hit = cur.execute("""
         SELECT 1 FROM MajorCourses WHERE major_id = ? AND course_id = ? LIMIT 1
     """, (major_id, course_id)).fetchone()
-    conn.close()
     return hit is not None
 
 
 def is_minor_course(course_id: str, minor_id: str, db_path: str) -> bool:
-    conn = sqlite3.connect(db_path)
-    cur = conn.cursor()
+    cur = get_connection(db_path).cursor()
     hit = cur.execute("""
         SELECT 1 FROM MinorCourses WHERE minor_id = ? AND course_id = ? LIMIT 1
     """, (minor_id, course_id)).fetchone()
-    conn.close()
     return hit is not None
 
 
 def score_course_simple(course_id: str, db_path: str, majors: set, minors: set):
-    # weights (tune later)
-    W_MAJOR = 4.0
-    W_MINOR = 2.0
-    W_NO_PREREQ = 0.5
-
     score = 0.0
     reasons = []
 
@@ -414,14 +1031,57 @@ def score_course_simple(course_id: str, db_path: str, majors: set, minors: set):
 
     return score, reasons[:3]
 
-def main():
-    with open("all_course_data.json", "r") as f:
-        all_course_data = json.load(f)
-        create_index(DB_PATH, all_course_data)
+def score_courses(course_ids, db_path: str, majors: set, minors: set) -> dict:
+    """
+    score_courses: score_course_simple for a whole candidate set
+        returns {course_id: (score, reasons)}
+
+    Major/minor membership and "has prerequisites" come back from one query
+    instead of one connection per course, major and minor.
+    """
+    rows = get_connection(db_path).execute("""
+        SELECT c.value,
+            EXISTS (SELECT 1 FROM MajorCourses m
+                    WHERE m.course_id = c.value
+                      AND m.major_id IN (SELECT value FROM json_each(:majors))),
+            EXISTS (SELECT 1 FROM MinorCourses n
+                    WHERE n.course_id = c.value
+                      AND n.minor_id IN (SELECT value FROM json_each(:minors))),
+            EXISTS (SELECT 1 FROM Prerequisites p WHERE p.course_id = c.value)
+        FROM json_each(:courses) c
+    """, {
+        "courses": json.dumps(list(course_ids)),
+        "majors": json.dumps(list(majors)),
+        "minors": json.dumps(list(minors))
+    }).fetchall()
+
+    return _scores(rows)
+
+def _scores(rows) -> dict:
+    # (course_id, in_major, in_minor, has_prereqs) rows --> {course_id: (score, reasons)}
+    scores = {}
+    for cid, in_major, in_minor, has_prereqs in rows:
+        score = 0.0
+        reasons = []
+        if in_major:
+            score += W_MAJOR
+            reasons.append("Required for your major")
+        if in_minor:
+            score += W_MINOR
+            reasons.append("Counts toward your minor")
+        if not has_prereqs:
+            score += W_NO_PREREQ
+            reasons.append("No prerequisites")
+        scores[cid] = (score, reasons)
+    return scores
+
+def main(incremental=False):
+    load_index(DB_PATH, "all_course_data.json", incremental=incremental)
     
 
 if __name__ == "__main__":
-    main()
+    # python sql_index.py --incremental --> only apply catalog changes to an existing courses.db
+    main("--incremental" in sys.argv)
     
     # spring_2026 = filter_course_term(2026, "Spring")
     # for course in spring_2026:
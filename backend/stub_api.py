@@ -0,0 +1,146 @@
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+""" Local stand-in for the Anteater API endpoints used by data_collection
+
+    Run:  python stub_api.py [port] [fail_rate]
+    Then: ANTEATER_API_URL=http://127.0.0.1:<port> python data_collection.py
+
+    fail_rate is the fraction of requests answered with 429/503 to exercise retries.
+"""
+
+QUARTERS = ["Fall", "Winter", "Spring"]
+DEPARTMENTS = ["I&C SCI", "COMPSCI", "MATH", "WRITING"]
+
+def make_courses(n_courses):
+    courses = []
+    for i in range(n_courses):
+        dept = DEPARTMENTS[i % len(DEPARTMENTS)]
+        number = str(i // len(DEPARTMENTS) + 1)
+        courses.append({
+            "id": dept.replace(" ", "") + number,
+            "department": dept,
+            "courseNumber": number,
+            "title": f"{dept} course {number}",
+            "description": "Stub course",
+            "minUnits": 4,
+            "maxUnits": 4,
+            "geList": [],
+            "prerequisites": [],
+            "terms": ["2025 Fall", "2026 Spring"]
+        })
+    return courses
+
+class StubAPI():
+    """
+
+    Fake API state shared by the request handlers
+
+    Member Variables:
+        -courses: course records served by coursesCursor
+        -n_programs: majors and minors listed by the programs endpoints
+        -fail_rate: fraction of requests answered with 429 or 503
+        -requests: (timestamp, path) of every request received
+
+    """
+    def __init__(self, n_courses=250, n_programs=10, fail_rate=0.0):
+        self.courses = make_courses(n_courses)
+        self.n_programs = n_programs
+        self.fail_rate = fail_rate
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def record(self, path):
+        with self._lock:
+            self.requests.append((time.monotonic(), path))
+
+    def route(self, path, params):
+        if path.endswith("/coursesCursor"):
+            take = int(params.get("take", 100))
+            start = int(params.get("cursor", 0))
+            end = start + take
+            next_cursor = str(end) if end < len(self.courses) else None
+            return {"items": self.courses[start:end], "nextCursor": next_cursor}
+        if path.endswith("/programs/majors") or path.endswith("/programs/minors"):
+            kind = "BS" if path.endswith("majors") else "MN"
+            return [{"id": f"{kind}-{i}", "name": f"Program {i}"} for i in range(self.n_programs)]
+        if path.endswith("/programs/major") or path.endswith("/programs/minor"):
+            return {"id": params.get("programId"), "requirements": []}
+        if path.endswith("/websoc/terms"):
+            return [{"shortName": f"2026 {q}"} for q in QUARTERS]
+        if path.endswith("/websoc"):
+            return {"schools": [{"departments": [{"deptCode": "I&C SCI", "courses": [{
+                "courseNumber": "1",
+                "sections": [{"sectionCode": "10000", "sectionType": "Lec", "meetings": [{
+                    "bldg": ["SSH 100"], "days": "MWF",
+                    "startTime": {"hour": 10, "minute": 0},
+                    "endTime": {"hour": 10, "minute": 50}
+                }]}]
+            }]}]}]}
+        return None
+
+def make_handler(api):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            api.record(url.path)
+            if random.random() < api.fail_rate:
+                status = random.choice([429, 503])
+                self.send_response(status)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            params = {k: v[0] for k, v in parse_qs(url.query).items()}
+            data = api.route(url.path, params)
+            if data is None:
+                self.send_error(404)
+                return
+            body = json.dumps({"ok": True, "data": data}).encode()
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+def serve(port=0, **kwargs):
+    """
+    serve: starts the stub on a background thread
+        returns (server, api), server.server_address has the bound port
+    """
+    api = StubAPI(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(api))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, api
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    fail_rate = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    server, api = serve(port, fail_rate=fail_rate)
+    print(f"Stub Anteater API on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,86 @@
+import random
+import sqlite3
+
+import pytest
+
+import benchmark
+import sql_index
+from connection import close_all
+from sql_index import CourseQuery, SearchEngine
+
+""" The SQL, catalog and batch search paths must agree on every query
+
+    Run: python -m pytest -q test_search_paths.py
+"""
+
+COURSES = 400
+MAJORS = 20
+MINORS = 10
+SPECIALIZATIONS = 6
+QUERIES = 300
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("search") / "courses.db")
+    records = list(benchmark.generate_catalog(COURSES, terms=6, prereqs=2.0, seed=1))
+    sql_index.create_index(path, records).close()
+    course_ids = [course["id"] for course in records]
+    benchmark.add_programs(path, course_ids, MAJORS, MINORS, size=30, seed=1)
+
+    rng = random.Random(1)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO Specializations(specialization_id, specialization_name, major_id) VALUES (?, ?, ?)",
+                     [(f"SP-{s}", f"Specialization {s}", f"BS-{s}") for s in range(SPECIALIZATIONS)])
+    conn.executemany("INSERT INTO SpecializationCourses(specialization_id, course_id) VALUES (?, ?)",
+                     [(f"SP-{s}", cid) for s in range(SPECIALIZATIONS) for cid in rng.sample(course_ids, 15)])
+    sql_index.bump_db_version(conn)
+    conn.commit()
+    conn.close()
+    yield path
+    close_all(path)
+
+def random_queries(db_path, count, seed=0) -> list:
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    course_ids = [row[0] for row in conn.execute("SELECT course_id FROM Courses")]
+    terms = conn.execute("SELECT DISTINCT year, quarter FROM Terms").fetchall()
+    conn.close()
+
+    queries = []
+    for _ in range(count):
+        year, quarter = rng.choice(terms + [(None, None)])
+        queries.append(CourseQuery(
+            majors=[f"BS-{m}" for m in rng.sample(range(MAJORS), rng.choice([0, 1, 1, 2]))],
+            minors=[f"MN-{m}" for m in rng.sample(range(MINORS), rng.choice([0, 0, 1]))],
+            specializations=[f"SP-{s}" for s in rng.sample(range(SPECIALIZATIONS), rng.choice([0, 0, 1]))],
+            completed=rng.sample(course_ids, rng.randint(0, 60)),
+            year=year,
+            quarter=rng.choice([quarter, quarter and quarter.title()]),
+            time_of_day=rng.choice([None, None, "morning", "afternoon", "evening"]),
+            course_format=rng.choice([None, None, "in-person", "online"])
+        ))
+    return queries
+
+def test_catalog_matches_sql(db_path):
+    sql_engine = SearchEngine(db_path, cache=None, use_catalog=False)
+    engine = SearchEngine(db_path, cache=None)
+    mismatches = [query for query in random_queries(db_path, QUERIES)
+                  if engine.search(query) != sql_engine.search(query)]
+    assert not mismatches
+
+def test_batch_matches_sql(db_path):
+    sql_engine = SearchEngine(db_path, cache=None, use_catalog=False)
+    engine = SearchEngine(db_path, cache=None)
+    queries = random_queries(db_path, QUERIES, seed=1)
+    # a small chunk size so the batch spans several chunks
+    results = list(engine.search_many(queries, chunk_size=64))
+    assert [position for position, _ in results] == list(range(len(queries)))
+    mismatches = [queries[position] for position, courses in results
+                  if courses != sql_engine.search(queries[position])]
+    assert not mismatches
+
+def test_results_are_not_trivial(db_path):
+    # the comparisons above mean little if every search comes back empty
+    sql_engine = SearchEngine(db_path, cache=None, use_catalog=False)
+    sizes = [len(sql_engine.search(query)) for query in random_queries(db_path, 50)]
+    assert sum(1 for size in sizes if size) > len(sizes) // 2
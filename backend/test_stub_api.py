@@ -0,0 +1,77 @@
+import time
+
+import pytest
+import requests
+
+import stub_api
+from fetcher import Fetcher
+from http_cache import ResponseCache
+
+""" Fetcher retries, rate limiting and cache revalidation against stub_api
+
+    Run: python -m pytest -q test_stub_api.py
+"""
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(**kwargs):
+        server, api = stub_api.serve(**kwargs)
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}", api
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_retries_until_success(stub):
+    url, api = stub(fail_rate=0.5)
+    fetcher = Fetcher(rate=1000, burst=1000, max_retries=20, backoff=0.001)
+    for _ in range(10):
+        data = fetcher.get(f"{url}/coursesCursor", {"take": 5}).json()["data"]
+        assert len(data["items"]) == 5
+    assert len(api.requests) >= 10
+
+def test_gives_up_after_max_retries(stub):
+    url, api = stub(fail_rate=1.0)
+    fetcher = Fetcher(rate=1000, burst=1000, max_retries=2, backoff=0.001)
+    with pytest.raises(requests.HTTPError):
+        fetcher.get(f"{url}/coursesCursor")
+    # the first attempt plus two retries
+    assert len(api.requests) == 3
+
+def test_rate_limit(stub):
+    url, api = stub()
+    rate = 20
+    fetcher = Fetcher(rate=rate, burst=1, max_concurrency=4)
+    start = time.monotonic()
+    fetcher.map(lambda _: fetcher.get(f"{url}/websoc/terms"), range(11))
+    elapsed = time.monotonic() - start
+
+    # one request goes out right away, the other ten wait for a token each
+    assert len(api.requests) == 11
+    assert elapsed >= 10 / rate * 0.9
+    times = sorted(t for t, _ in api.requests)
+    assert times[-1] - times[0] >= 10 / rate * 0.9
+
+def test_revalidates_stale_entries(stub, tmp_path):
+    url, api = stub()
+    # ttl=0 --> every lookup is stale and has to be revalidated with the stored ETag
+    cache = ResponseCache(str(tmp_path / "cache.db"), ttl=0)
+    fetcher = Fetcher(rate=1000, burst=1000, cache=cache)
+    try:
+        first = fetcher.get_json(f"{url}/programs/majors")
+        second = fetcher.get_json(f"{url}/programs/majors")
+        assert first == second
+        assert cache.stats() == {"hits": 0, "revalidated": 1, "misses": 1}
+        assert len(api.requests) == 2
+
+        # fresh entries are served without a request
+        cache.ttl = 60
+        assert fetcher.get_json(f"{url}/programs/majors") == first
+        assert cache.stats()["hits"] == 1
+        assert len(api.requests) == 2
+    finally:
+        cache.close()
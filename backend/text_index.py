@@ -0,0 +1,96 @@
+import json
+import math
+import re
+import heapq
+from collections import Counter
+
+from connection import get_connection
+
+""" Keyword index over course codes, titles and descriptions, ranked with BM25 """
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in",
+    "into", "is", "it", "of", "on", "or", "the", "this", "to", "with"
+}
+
+def tokenize(text: str) -> list[str]:
+    """
+    tokenize: lowercases text and splits it into alphanumeric tokens
+        "I&C SCI 31: Introduction to Programming" --> ["i", "c", "sci", "31", "introduction", "programming"]
+    """
+    if not text:
+        return []
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+def course_terms(course: dict) -> Counter:
+    """
+    course_terms: term frequencies for one course record from all_course_data.json
+        code tokens (department, course number, compact department and id) are
+        counted alongside the title and description tokens
+    """
+    terms = Counter()
+    department = course.get("department", "")
+    terms.update(tokenize(department))
+    terms.update(tokenize(course.get("courseNumber", "")))
+    terms.update(tokenize(course.get("title", "")))
+    terms.update(tokenize(course.get("description", "")))
+
+    # "I&C SCI" --> "icsci", "I&CSCI31" --> "icsci31"
+    compact_dept = "".join(tokenize(department))
+    compact_id = "".join(TOKEN_PATTERN.findall(course.get("id", "").lower()))
+    for token in (compact_dept, compact_id):
+        if token and token not in terms:
+            terms[token] += 1
+    return terms
+
+def text_rows(course: dict):
+    """
+    text_rows: rows for one course record
+        returns (InvertedCourseIndex rows, CourseDocuments row)
+    """
+    cid = course["id"]
+    terms = course_terms(course)
+    postings = [(cid, term, freq) for term, freq in terms.items()]
+    return postings, (cid, sum(terms.values()))
+
+def bm25_search(query: str, db_path: str, k: int = 10) -> list[tuple]:
+    """
+    bm25_search: ranks courses against a free text query
+        returns up to k (course_id, score) pairs, best first
+    """
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return []
+
+    conn = get_connection(db_path)
+    n_docs, avg_length = conn.execute(
+        "SELECT COUNT(*), AVG(length) FROM CourseDocuments"
+    ).fetchone()
+    if not n_docs:
+        return []
+
+    postings = conn.execute('''
+        SELECT i.course_id, i.term, i.frequency, d.length
+        FROM InvertedCourseIndex i
+        JOIN CourseDocuments d ON d.course_id = i.course_id
+        WHERE i.term IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(list(query_terms)),)).fetchall()
+
+    doc_freq = Counter(term for _, term, _, _ in postings)
+    idf = {
+        term: math.log((n_docs - df + 0.5) / (df + 0.5) + 1)
+        for term, df in doc_freq.items()
+    }
+
+    scores = {}
+    for cid, term, freq, length in postings:
+        norm = K1 * (1 - B + B * length / avg_length)
+        scores[cid] = scores.get(cid, 0.0) + idf[term] * freq * (K1 + 1) / (freq + norm)
+
+    return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
@@ -19,171 +19,6 @@ const profile = JSON.parse(localStorage.getItem('peterProfile') || 'null');
   if (qSel && profile.quarterTarget) qSel.value = profile.quarterTarget;
 })();
 
-/* ---------- Demo course data (replace with AJAX) ---------- */
-
-const DEMO_COURSES = [
-  {
-    id: 'ICS31',
-    code: 'I&C SCI 31',
-    title: 'Introduction to Programming',
-    dept: 'I&C SCI',
-    level: 'lower',
-    units: 4,
-    instructor: 'Kay, R.',
-    time: 'MWF 10:00-10:50am',
-    location: 'SSH 100',
-    format: 'in-person',
-    ge: [],
-    tags: ['major'],
-    matchScore: 95,
-    explanation: 'Required for your ICS/CS major. No prerequisites — a great starting point.'
-  },
-  {
-    id: 'ICS32',
-    code: 'I&C SCI 32',
-    title: 'Programming with Software Libraries',
-    dept: 'I&C SCI',
-    level: 'lower',
-    units: 4,
-    instructor: 'Thornton, A.',
-    time: 'TuTh 2:00-3:20pm',
-    location: 'ALP 1300',
-    format: 'in-person',
-    ge: [],
-    tags: ['major', 'prereq'],
-    matchScore: 90,
-    explanation: 'Builds on ICS 31. Prerequisite: ICS 31 with grade C or better.'
-  },
-  {
-    id: 'WRITING40',
-    code: 'WRITING 40',
-    title: 'Intro to Writing & Rhetoric',
-    dept: 'WRITING',
-    level: 'lower',
-    units: 4,
-    instructor: 'Garcia, M.',
-    time: 'MWF 11:00-11:50am',
-    location: 'HH 112',
-    format: 'in-person',
-    ge: ['Ia'],
-    tags: ['ge'],
-    matchScore: 82,
-    explanation: 'Satisfies GE Ia (Lower Division Writing). Moderate workload with weekly essays.'
-  },
-  {
-    id: 'MATH2A',
-    code: 'MATH 2A',
-    title: 'Single-Variable Calculus I',
-    dept: 'MATH',
-    level: 'lower',
-    units: 4,
-    instructor: 'Chen, L.',
-    time: 'MWF 9:00-9:50am',
-    location: 'MSTB 120',
-    format: 'in-person',
-    ge: ['Va'],
-    tags: ['major', 'ge'],
-    matchScore: 88,
-    explanation: 'Satisfies GE Va and is required for most STEM majors. Morning section.'
-  },
-  {
-    id: 'ANTHRO2A',
-    code: 'ANTHRO 2A',
-    title: 'Intro to Sociocultural Anthropology',
-    dept: 'ANTHRO',
-    level: 'lower',
-    units: 4,
-    instructor: 'Dominguez, V.',
-    time: 'TuTh 11:00-12:20pm',
-    location: 'SSL 228',
-    format: 'in-person',
-    ge: ['III', 'VII'],
-    tags: ['ge'],
-    matchScore: 75,
-    explanation: 'Satisfies GE III and GE VII. No prerequisites, lighter workload.'
-  },
-  {
-    id: 'COMPSCI161',
-    code: 'COMPSCI 161',
-    title: 'Design and Analysis of Algorithms',
-    dept: 'COMPSCI',
-    level: 'upper',
-    units: 4,
-    instructor: 'Goodrich, M.',
-    time: 'TuTh 3:30-4:50pm',
-    location: 'DBH 1500',
-    format: 'in-person',
-    ge: [],
-    tags: ['major'],
-    matchScore: 92,
-    explanation: 'Core upper-division CS course. Prerequisites: ICS 46, MATH 2B, ICS 6D.'
-  },
-  {
-    id: 'ARTVIS20',
-    code: 'ART VIS 20',
-    title: 'Foundations in Digital Art',
-    dept: 'ART',
-    level: 'lower',
-    units: 4,
-    instructor: 'Park, S.',
-    time: 'MW 2:00-4:50pm',
-    location: 'CAC 2015',
-    format: 'in-person',
-    ge: ['IV'],
-    tags: ['ge'],
-    matchScore: 68,
-    explanation: 'Satisfies GE IV (Arts & Humanities). Fun elective, no prerequisites.'
-  },
-  {
-    id: 'PSYCH9A',
-    code: 'PSYCH 9A',
-    title: 'Psychology Fundamentals',
-    dept: 'PSYCH',
-    level: 'lower',
-    units: 4,
-    instructor: 'Hagedorn, J.',
-    time: 'MWF 1:00-1:50pm',
-    location: 'PCB 1100',
-    format: 'in-person',
-    ge: ['III'],
-    tags: ['ge'],
-    matchScore: 72,
-    explanation: 'Satisfies GE III. Large lecture format, manageable workload.'
-  },
-  {
-    id: 'IN4MATX43',
-    code: 'IN4MATX 43',
-    title: 'Introduction to Software Engineering',
-    dept: 'IN4MATX',
-    level: 'lower',
-    units: 4,
-    instructor: 'Ziv, H.',
-    time: 'TuTh 9:30-10:50am',
-    location: 'ICS 174',
-    format: 'in-person',
-    ge: [],
-    tags: ['major'],
-    matchScore: 85,
-    explanation: 'Recommended for ICS/SE majors. Covers SDLC, teamwork, testing.'
-  },
-  {
-    id: 'PHYSICS7C',
-    code: 'PHYSICS 7C',
-    title: 'Classical Physics',
-    dept: 'PHYSICS',
-    level: 'lower',
-    units: 4,
-    instructor: 'Feng, W.',
-    time: 'MWF 8:00-8:50am',
-    location: 'RH 104',
-    format: 'in-person',
-    ge: ['II'],
-    tags: ['ge', 'warning'],
-    matchScore: 60,
-    explanation: 'Satisfies GE II. Warning: early morning section with heavy workload.'
-  }
-];
-
 /* ---------- Render functions ---------- */
 
 function buildTagHTML(tags, ge) {
@@ -217,95 +52,103 @@ function renderCourseCard(course) {
     </div>`;
 }
 
-function renderResults(courses) {
+// append adds a further page below the cards already shown
+function renderResults(courses, total = courses.length, append = false) {
   const list  = document.getElementById('resultsList');
   const empty = document.getElementById('emptyState');
   const count = document.getElementById('resultCount');
+  const more  = document.getElementById('loadMore');
 
-  if (courses.length === 0) {
+  if (courses.length === 0 && !append) {
     list.innerHTML = '';
     empty.style.display = 'block';
     count.textContent = '0';
+    more.style.display = 'none';
     return;
   }
 
   empty.style.display = 'none';
-  count.textContent = courses.length;
-  list.innerHTML = courses.map(renderCourseCard).join('');
+  count.textContent = total;
+  if (append) list.insertAdjacentHTML('beforeend', courses.map(renderCourseCard).join(''));
+  else        list.innerHTML = courses.map(renderCourseCard).join('');
+  more.style.display = list.children.length < total ? 'block' : 'none';
 }
 
-/* ---------- Search via AJAX (stub) ---------- */
+/* ---------- Search via AJAX ---------- */
+
+// the search "Load more" continues: its query, filters and the last page shown
+let lastSearch = null;
 
 /**
- * Replace this function body with a real fetch() call to your backend.
- *
- * Example:
- *
- *   async function searchCourses(query, filters) {
- *     const spinner = document.getElementById('loadingSpinner');
- *     spinner.classList.add('show');
- *
- *     const params = new URLSearchParams({
- *       q:        query,
- *       quarter:  filters.quarter,
- *       dept:     filters.dept,
- *       level:    filters.level,
- *       ge:       filters.ge,
- *       time:     filters.time,
- *       format:   filters.format,
- *       maxUnits: filters.maxUnits
- *     });
- *
- *     // Include the user profile so the backend can personalize ranking
- *     const res = await fetch(`/api/search?${params}`, {
- *       method: 'POST',
- *       headers: { 'Content-Type': 'application/json' },
- *       body: JSON.stringify({ profile })
- *     });
- *     const data = await res.json();
- *
- *     spinner.classList.remove('show');
- *     renderResults(data.courses);
- *   }
+ * Filtering, keyword matching, sorting and paging all happen on the server
+ * (backend/server.py). The user profile is sent along so the backend can
+ * personalize ranking. Pages after the first are appended to the list.
  */
+async function searchCourses(query, filters, page = 1) {
+  const spinner = document.getElementById('loadingSpinner');
+  spinner.classList.add('show');
+
+  const params = new URLSearchParams({
+    q:        query,
+    quarter:  filters.quarter,
+    dept:     filters.dept,
+    level:    filters.level,
+    ge:       filters.ge,
+    time:     filters.time,
+    format:   filters.format,
+    maxUnits: filters.maxUnits,
+    sortBy:   document.getElementById('sortBy').value,
+    page:     page
+  });
+  lastSearch = { query, filters, page };
+
+  try {
+    const res = await fetch(`/api/search?${params}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ profile })
+    });
+    const data = await res.json();
+    if (res.ok) renderResults(data.courses, data.total, page > 1);
+    else        renderResults([]);
+  } catch (err) {
+    console.error('Search failed:', err);
+    renderResults([]);
+  } finally {
+    spinner.classList.remove('show');
+  }
+}
 
-function searchCourses(query, filters) {
+/**
+ * The "GE I Need" pill: the server picks a small set of courses open to the
+ * student that covers as many of profile.geNeeded as it can (/api/coverage).
+ */
+async function coverRequirements(filters) {
   const spinner = document.getElementById('loadingSpinner');
   spinner.classList.add('show');
 
-  // Simulate AJAX delay
-  setTimeout(() => {
-    let results = [...DEMO_COURSES];
-
-    // Client-side filtering (demo only — real filtering happens on the server)
-    if (query) {
-      const q = query.toLowerCase();
-      results = results.filter(c =>
-        c.title.toLowerCase().includes(q) ||
-        c.code.toLowerCase().includes(q) ||
-        c.dept.toLowerCase().includes(q) ||
-        c.explanation.toLowerCase().includes(q) ||
-        c.ge.some(g => g.toLowerCase().includes(q))
-      );
-    }
-    if (filters.dept)     results = results.filter(c => c.dept === filters.dept);
-    if (filters.level)    results = results.filter(c => c.level === filters.level);
-    if (filters.ge)       results = results.filter(c => c.ge.includes(filters.ge));
-    if (filters.format && filters.format !== '')
-      results = results.filter(c => c.format === filters.format);
-    if (filters.maxUnits && filters.maxUnits < 8)
-      results = results.filter(c => c.units <= filters.maxUnits);
-
-    // Sort
-    const sortBy = document.getElementById('sortBy').value;
-    if (sortBy === 'match')      results.sort((a, b) => b.matchScore - a.matchScore);
-    if (sortBy === 'units-asc')  results.sort((a, b) => a.units - b.units);
-    if (sortBy === 'units-desc') results.sort((a, b) => b.units - a.units);
-    if (sortBy === 'dept')       results.sort((a, b) => a.dept.localeCompare(b.dept));
+  const params = new URLSearchParams({
+    quarter: filters.quarter,
+    time:    filters.time,
+    format:  filters.format
+  });
 
+  try {
+    const res = await fetch(`/api/coverage?${params}`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ profile })
+    });
+    lastSearch = null;
+    const data = await res.json();
+    if (res.ok) renderResults(data.courses);
+    else        renderResults([]);
+  } catch (err) {
+    console.error('Coverage failed:', err);
+    renderResults([]);
+  } finally {
     spinner.classList.remove('show');
-    renderResults(results);
-  }, 400);
+  }
 }
 
 /* ---------- Gather current filter values ---------- */
@@ -331,6 +174,34 @@ document.getElementById('searchInput').addEventListener('keydown', e => {
   }
 });
 
+// Typeahead suggestions, a newer keystroke cancels the request still in flight
+let suggestRequest = null;
+document.getElementById('searchInput').addEventListener('input', async e => {
+  const text = e.target.value.trim();
+  const list = document.getElementById('searchSuggestions');
+  if (suggestRequest) suggestRequest.abort();
+  if (!text) {
+    list.innerHTML = '';
+    return;
+  }
+  suggestRequest = new AbortController();
+  try {
+    const res = await fetch(`/api/suggest?${new URLSearchParams({ q: text })}`,
+                            { signal: suggestRequest.signal });
+    if (!res.ok) return;
+    const data = await res.json();
+    list.innerHTML = '';
+    data.suggestions.forEach(s => {
+      const option = document.createElement('option');
+      option.value = s.code;
+      option.label = s.title;
+      list.appendChild(option);
+    });
+  } catch (err) {
+    if (err.name !== 'AbortError') console.error('Suggest failed:', err);
+  }
+});
+
 // Apply filters button
 function applyFilters() {
   const query = document.getElementById('searchInput').value.trim();
@@ -379,9 +250,10 @@ document.querySelectorAll('.pill').forEach(pill => {
           }
           break;
         case 'ge':
-          // If user has GE needs, pick first one
+          // If user has GE needs, show the fewest courses covering the most of them
           if (profile && profile.geNeeded && profile.geNeeded.length > 0) {
-            document.getElementById('filterGE').value = profile.geNeeded[0];
+            coverRequirements(getFilters());
+            return;
           }
           break;
         case 'no-prereq':
@@ -403,6 +275,11 @@ document.querySelectorAll('.pill').forEach(pill => {
   });
 });
 
+// Next page of the current search
+document.getElementById('loadMore').addEventListener('click', () => {
+  if (lastSearch) searchCourses(lastSearch.query, lastSearch.filters, lastSearch.page + 1);
+});
+
 // Sort change
 document.getElementById('sortBy').addEventListener('change', () => {
   const query = document.getElementById('searchInput').value.trim();